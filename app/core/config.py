@@ -6,12 +6,85 @@ class Settings(BaseSettings):
     APP_NAME: str = "IMAGE EHR"
     SECRET_KEY: str
     SESSION_TIMEOUT_MIN: int = 30
+
+    # Server-side sessions (app/services/sessions.py)
+    SESSION_COOKIE_NAME: str = "ehr_session"
+    SESSION_HTTPS_ONLY: bool = False
+    SESSION_CACHE_SIZE: int = 10000
+    SESSION_CACHE_TTL_SEC: float = 60.0
+    SESSION_TOUCH_FLUSH_SEC: float = 15.0
+
+    # User/role context cache (app/services/user_context.py); NOTIFY invalidates sooner
+    USER_CONTEXT_TTL_SEC: float = 60.0
+    USER_CONTEXT_CACHE_SIZE: int = 10000
+
     POSTGRES_DSN: PostgresDsn
 
+    # Connection pool
+    DB_POOL_MIN: int = 1
+    DB_POOL_MAX: int = 10
+    DB_POOL_TIMEOUT_SEC: float = 5.0
+    DB_POOL_MAX_USES: int = 500
+    DB_POOL_PING_IDLE_SEC: float = 30.0
+    # Async pool (app/db/async_pools.py), in addition to DB_POOL_MAX per worker
+    DB_ASYNC_POOL_MAX: int = 5
+    DB_ASYNC_POOL_MAX_LIFETIME_SEC: float = 1800.0
+    DB_CONNECT_TIMEOUT_SEC: int = 10
+
+    # Patient search
+    SEARCH_TOP_K: int = 50
+    SEARCH_SIMILARITY_THRESHOLD: float = 0.4
+    PHONE_COUNTRY_CODE: str = "880"
+
+    # Patient codes (app/services/patient_codes.py)
+    PATIENT_CODE_PREFIX: str = "PAT"
+    PATIENT_CODE_BLOCK_SIZE: int = 20
+    PATIENT_CODE_PER_CLINIC: bool = False
+
+    # Clinic directory cache (app/services/clinic_directory.py)
+    CLINIC_CACHE_TTL_SEC: int = 300
+
+    # Headline counts: counters | estimate | exact (app/services/table_counts.py)
+    HEADLINE_COUNT_MODE: str = "counters"
+
+    # Offline GeoIP (app/services/geoip.py)
+    GEOIP_DB_PATH: str = "data/geoip.csv"
+    GEOIP_CACHE_SIZE: int = 10000
+    GEOIP_RELOAD_CHECK_SEC: float = 60.0
+
+    # Write-behind login audit (app/services/login_audit.py)
+    LOGIN_AUDIT_QUEUE_SIZE: int = 10000
+    LOGIN_AUDIT_BATCH_SIZE: int = 500
+    LOGIN_AUDIT_FLUSH_SEC: float = 1.0
+
+    # login_logs monthly partitions (app/services/login_log_partitions.py)
+    LOGIN_LOG_PARTITIONS_AHEAD: int = 3
+    LOGIN_LOG_RETENTION_MONTHS: int = 12
+    LOGIN_LOG_ARCHIVE_DIR: str = "archive/login_logs"
+
+    # Login rate limiting (app/services/rate_limit.py); "postgres" shares limits across workers
+    LOGIN_RATE_IP_PER_MIN: float = 30.0
+    LOGIN_RATE_IP_BURST: int = 20
+    LOGIN_RATE_USER_PER_MIN: float = 10.0
+    LOGIN_RATE_USER_BURST: int = 5
+    LOGIN_RATE_MAX_KEYS: int = 100000
+    LOGIN_RATE_BACKEND: str = "memory"
+
+    # Password hashing (app/services/passwords.py); scrypt memory is 128 * N * R bytes
+    PASSWORD_SCRYPT_N: int = 16384
+    PASSWORD_SCRYPT_R: int = 8
+    PASSWORD_SCRYPT_P: int = 1
+    PASSWORD_HASH_WORKERS: int = 0      # 0 = one per CPU core
+    PASSWORD_HASH_QUEUE: int = 64
+
+    # Service call cache (app/services/cache.py)
+    DASHBOARD_CACHE_TTL_SEC: float = 30.0
+    DASHBOARD_CACHE_STALE_SEC: float = 300.0
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
 @lru_cache
 def get_settings() -> Settings:
-    return Settings()
\ No newline at end of file
+    return Settings()
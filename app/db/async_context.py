@@ -0,0 +1,10 @@
+from contextlib import asynccontextmanager
+from app.db.async_pools import async_pool
+
+@asynccontextmanager
+async def get_async_cursor():
+    # The pool's connection() block commits on success and rolls back on error,
+    # matching get_db_cursor().
+    async with async_pool.connection() as conn:
+        async with conn.cursor() as cur:
+            yield cur
@@ -0,0 +1,25 @@
+from psycopg_pool import AsyncConnectionPool
+from app.core.config import get_settings
+from app.db.rows import ROW_FACTORY
+
+settings = get_settings()
+
+# Opened on application startup; an AsyncConnectionPool has to be opened
+# from inside the running event loop. It is sized separately from the sync
+# pool: a worker can hold DB_POOL_MAX + DB_ASYNC_POOL_MAX connections.
+# Like BoundedConnectionPool, connections are checked before being handed
+# out and recycled after a while (by age here rather than by use count).
+async_pool = AsyncConnectionPool(
+    conninfo=str(settings.POSTGRES_DSN),
+    min_size=min(settings.DB_POOL_MIN, settings.DB_ASYNC_POOL_MAX),
+    max_size=settings.DB_ASYNC_POOL_MAX,
+    timeout=settings.DB_POOL_TIMEOUT_SEC,
+    max_idle=settings.DB_POOL_PING_IDLE_SEC * 10,
+    max_lifetime=settings.DB_ASYNC_POOL_MAX_LIFETIME_SEC,
+    check=AsyncConnectionPool.check_connection,
+    kwargs={
+        "connect_timeout": settings.DB_CONNECT_TIMEOUT_SEC,
+        "row_factory": ROW_FACTORY,
+    },
+    open=False,
+)
@@ -0,0 +1,61 @@
+class QueryBatch:
+    """Independent statements sent to Postgres in a single round trip.
+
+    Statements are queued with scalar()/one()/rows() and executed together
+    using psycopg 3 pipeline mode, so a page that needs N unrelated results
+    pays one network round trip instead of N.
+
+        batch = QueryBatch()
+        batch.scalar("total", "SELECT COUNT(*) FROM patients", default=0)
+        batch.rows("recent", "SELECT ... LIMIT 20")
+        async with get_async_cursor() as cursor:
+            results = await batch.run(cursor.connection)
+        results["total"], results["recent"]
+    """
+
+    SCALAR = "scalar"
+    ONE = "one"
+    ROWS = "rows"
+
+    def __init__(self):
+        self._items = []
+
+    def _add(self, name, kind, sql, params, default):
+        self._items.append((name, kind, sql, params, default))
+        return self
+
+    def scalar(self, name, sql, params=None, default=None):
+        """First column of the first row, or ``default`` if there is no row/NULL."""
+        return self._add(name, self.SCALAR, sql, params, default)
+
+    def one(self, name, sql, params=None):
+        """First row as a tuple, or None."""
+        return self._add(name, self.ONE, sql, params, None)
+
+    def rows(self, name, sql, params=None):
+        """All rows as a list of tuples."""
+        return self._add(name, self.ROWS, sql, params, [])
+
+    def defaults(self):
+        return {name: default for name, _, _, _, default in self._items}
+
+    async def run(self, conn):
+        cursors = []
+        async with conn.pipeline():
+            for _, _, sql, params, _ in self._items:
+                cur = conn.cursor()
+                await cur.execute(sql, params)
+                cursors.append(cur)
+        # Leaving the pipeline block syncs once; every result is buffered now.
+        results = {}
+        for (name, kind, _, _, default), cur in zip(self._items, cursors):
+            if kind == self.ROWS:
+                results[name] = await cur.fetchall()
+            else:
+                row = await cur.fetchone()
+                if kind == self.ONE:
+                    results[name] = row
+                else:
+                    results[name] = row[0] if row and row[0] is not None else default
+            await cur.close()
+        return results
@@ -9,7 +9,8 @@ def get_db_cursor():
             yield cur
             conn.commit()
     except Exception:
-        conn.rollback()
+        if not conn.closed:
+            conn.rollback()
         raise
     finally:
         pool.putconn(conn)
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""Keyset (cursor) pagination over a ``(<timestamp column>, id)`` ordering.
+
+Pages are addressed by opaque tokens that carry the sort key of the row at
+the page edge, so every page is an index range scan from that key and deep
+pages cost the same as the first one (unlike OFFSET).
+"""
+import base64
+import json
+from datetime import datetime
+
+NEXT = "n"
+PREV = "p"
+
+def encode_token(direction, sort_value, row_id):
+    payload = json.dumps([direction, sort_value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_token(token):
+    """Return (direction, sort value, id); raises ValueError on a bad token"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        direction, sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in (NEXT, PREV):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(sort_value), int(row_id)
+    except Exception as e:
+        raise ValueError(f"invalid page token: {token!r}") from e
+
+def keyset_query(token, alias="p", column="created_at"):
+    """SQL fragments for fetching the page ``token`` points at.
+
+    Returns (where, params, order_by, direction). ``where`` is empty for the
+    first page; otherwise it is a row comparison that a ``(column, id)``
+    index can satisfy directly.
+    """
+    key = f"{alias}.{column}"
+    if not token:
+        return "", (), f"{key} DESC, {alias}.id DESC", NEXT
+    direction, sort_value, row_id = decode_token(token)
+    if direction == NEXT:
+        return (f"({key}, {alias}.id) < (%s, %s)", (sort_value, row_id),
+                f"{key} DESC, {alias}.id DESC", NEXT)
+    # Walk backwards in ascending order, then flip the page in paginate()
+    return (f"({key}, {alias}.id) > (%s, %s)", (sort_value, row_id),
+            f"{key} ASC, {alias}.id ASC", PREV)
+
+def paginate(rows, page_size, direction, has_token, column="created_at"):
+    """Trim a ``page_size + 1`` fetch to one page and build its tokens.
+
+    Returns (rows, next_token, prev_token); rows must expose ``column``
+    and ``id`` as attributes.
+    """
+    rows = list(rows)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == PREV:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, has_token
+
+    next_token = prev_token = None
+    if rows and has_next:
+        next_token = encode_token(NEXT, getattr(rows[-1], column), rows[-1].id)
+    if rows and has_prev:
+        prev_token = encode_token(PREV, getattr(rows[0], column), rows[0].id)
+    return rows, next_token, prev_token
@@ -0,0 +1,80 @@
+"""Postgres LISTEN/NOTIFY fan-in for in-process caches.
+
+One dedicated connection per process (outside the pools) LISTENs on every
+registered channel; each notification's payload is passed to the channel's
+handlers on the event loop. While disconnected, notifications are lost, so
+after every (re)connect each handler is called with ``None`` and should
+drop everything it caches.
+
+    pg_listener.on("user_changed", user_contexts.on_notify)
+"""
+from app.core.config import get_settings
+import asyncio
+import logging
+import psycopg
+
+logger = logging.getLogger(__name__)
+
+class PgListener:
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.connected = False
+        self.received = 0
+        self.reconnects = 0
+        self._handlers = {}
+        self._task = None
+
+    def on(self, channel, handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def _dispatch(self, channel, payload):
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"NOTIFY handler for {channel} failed: {e}")
+
+    async def _listen(self):
+        async with await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as conn:
+            for channel in self._handlers:
+                await conn.execute(f'LISTEN "{channel}"')
+            self.connected = True
+            for channel in self._handlers:
+                self._dispatch(channel, None)
+            async for notify in conn.notifies():
+                self.received += 1
+                self._dispatch(notify.channel, notify.payload)
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"NOTIFY listener disconnected: {e}")
+            if self.connected:
+                delay = 1
+            self.connected = False
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    async def start(self):
+        if self._task is None and self._handlers:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.connected = False
+
+    def stats(self):
+        return {"connected": self.connected, "channels": sorted(self._handlers),
+                "received": self.received, "reconnects": self.reconnects}
+
+settings = get_settings()
+
+pg_listener = PgListener(str(settings.POSTGRES_DSN))
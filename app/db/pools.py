@@ -1,11 +1,164 @@
+import threading
+import time
+import logging
 import psycopg2
-from psycopg2.pool import SimpleConnectionPool
+import psycopg2.extensions
+from psycopg2.pool import PoolError
 from app.core.config import get_settings
+from app.db.rows import CURSOR_FACTORY
+
+logger = logging.getLogger(__name__)
+
+class BoundedConnectionPool:
+    """Thread-safe psycopg2 pool.
+
+    Callers block up to ``timeout`` seconds for a free connection once
+    ``maxconn`` are checked out. Connections are checked for liveness before
+    being handed out and are replaced after ``max_uses`` checkouts.
+    """
+
+    def __init__(self, minconn, maxconn, dsn, timeout=5.0, max_uses=500,
+                 ping_idle=30.0, connect_timeout=10, cursor_factory=None):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.dsn = dsn
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.ping_idle = ping_idle
+        self.connect_timeout = connect_timeout
+        self.cursor_factory = cursor_factory
+
+        self._cond = threading.Condition()
+        self._idle = []        # [(conn, returned_at)], most recently used last
+        self._uses = {}        # id(conn) -> checkout count
+        self._size = 0         # open connections, idle + checked out
+        self._closed = False
+
+        for _ in range(minconn):
+            self._size += 1
+            conn = self._open()
+            self._idle.append((conn, time.monotonic()))
+
+    def _open(self):
+        # The slot in self._size is reserved by the caller; connecting happens
+        # outside the lock so a slow TLS handshake doesn't stall other threads.
+        try:
+            conn = psycopg2.connect(
+                self.dsn,
+                connect_timeout=self.connect_timeout,
+                cursor_factory=self.cursor_factory,
+            )
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._uses[id(conn)] = 1
+        return conn
+
+    def _discard(self, conn):
+        self._uses.pop(id(conn), None)
+        self._size -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn, idle_for):
+        if conn.closed:
+            return False
+        status = conn.get_transaction_status()
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if idle_for < self.ping_idle:
+            return True
+        # Only pay a round trip for connections that sat long enough for the
+        # server or a load balancer to have dropped them.
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("connection pool is closed")
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolError(
+                            f"no connection available within {timeout:.1f}s "
+                            f"({self.maxconn} in use)"
+                        )
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                return self._open()
+            if self._is_alive(conn, time.monotonic() - returned_at):
+                with self._cond:
+                    self._uses[id(conn)] += 1
+                return conn
+            logger.warning("Discarding dead pooled connection")
+            with self._cond:
+                self._discard(conn)
+                self._cond.notify()
+
+    def putconn(self, conn, close=False):
+        with self._cond:
+            if id(conn) not in self._uses:
+                return
+            if not close and not conn.closed:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        close = True
+            if close or self._closed or conn.closed or self._uses[id(conn)] >= self.max_uses:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max": self.maxconn,
+            }
 
 settings = get_settings()
 
-pool = SimpleConnectionPool(
-    minconn=1,
-    maxconn=10,
-    dsn=str(settings.POSTGRES_DSN)  # <-- this is the fix
-)
\ No newline at end of file
+pool = BoundedConnectionPool(
+    minconn=settings.DB_POOL_MIN,
+    maxconn=settings.DB_POOL_MAX,
+    dsn=str(settings.POSTGRES_DSN),
+    timeout=settings.DB_POOL_TIMEOUT_SEC,
+    max_uses=settings.DB_POOL_MAX_USES,
+    ping_idle=settings.DB_POOL_PING_IDLE_SEC,
+    connect_timeout=settings.DB_CONNECT_TIMEOUT_SEC,
+    cursor_factory=CURSOR_FACTORY,
+)
@@ -0,0 +1,20 @@
+"""Row mapping shared by both pools.
+
+Cursors from get_db_cursor() and get_async_cursor() return named tuples whose
+fields are the query's column names, so handlers alias columns in SQL
+(``p.full_name AS name``) and pass rows straight to templates instead of
+rebuilding dicts by index. The drivers generate the tuple class once per
+distinct column list and cache it; each row then costs a single tuple.
+"""
+from psycopg2.extras import NamedTupleCursor
+from psycopg.rows import namedtuple_row
+
+# psycopg2 (sync pool)
+CURSOR_FACTORY = NamedTupleCursor
+
+# psycopg 3 (async pool)
+ROW_FACTORY = namedtuple_row
+
+def row_to_dict(row):
+    """Plain dict for a row, for JSON-serialised storage such as the session"""
+    return row._asdict() if row is not None else None
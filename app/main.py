@@ -1,15 +1,27 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.sessions import SessionMiddleware
 from app.core.config import get_settings
 
 def create_app() -> FastAPI:
     cfg = get_settings()
     app = FastAPI(title=cfg.APP_NAME)
 
-    app.add_middleware(SessionMiddleware, secret_key=cfg.SECRET_KEY)
+    # Cookie holds only a session id; data lives server-side (app/services/sessions.py)
+    from app.services.sessions import ServerSessionMiddleware, session_store
+    app.add_middleware(ServerSessionMiddleware, store=session_store,
+                       cookie_name=cfg.SESSION_COOKIE_NAME, https_only=cfg.SESSION_HTTPS_ONLY)
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
+    # Raised by the current_user/require_admin dependencies
+    from app.services.user_context import LoginRequired
+
+    async def login_required(request: Request, exc: LoginRequired):
+        if "text/html" in request.headers.get("accept", ""):
+            return RedirectResponse("/login")
+        return JSONResponse({"error": "Not authenticated"}, status_code=401)
+    app.add_exception_handler(LoginRequired, login_required)
+
     # Include NEW modular routers FIRST
     from app.routers import auth, dashboard, health, admin, billing, patients, visits
     
@@ -21,7 +33,37 @@ def create_app() -> FastAPI:
     app.include_router(billing.router)
     app.include_router(visits.router)
 
-    
+    from app.db.pools import pool
+    from app.db.async_pools import async_pool
+    app.add_event_handler("startup", async_pool.open)
+    app.add_event_handler("startup", session_store.start)
+    # Registered first so pending last-seen times are written before the pool closes
+    app.add_event_handler("shutdown", session_store.stop)
+    app.add_event_handler("shutdown", async_pool.close)
+
+    # Flush queued login audit rows before the sync pool goes away
+    from app.services.login_audit import login_audit
+    app.add_event_handler("startup", login_audit.start)
+    app.add_event_handler("shutdown", login_audit.stop)
+    app.add_event_handler("shutdown", pool.closeall)
+
+    from app.services.login_log_partitions import start_partition_upkeep
+    app.add_event_handler("startup", start_partition_upkeep)
+
+    from app.services.patient_suggest import start_suggest_index
+    app.add_event_handler("startup", start_suggest_index)
+
+    from app.services.geoip import start_geoip
+    app.add_event_handler("startup", start_geoip)
+
+    from app.services.events import event_bus
+    app.add_event_handler("startup", event_bus.start)
+
+    # Cache invalidation from other workers (user_changed, session_revoked)
+    from app.db.notify import pg_listener
+    app.add_event_handler("startup", pg_listener.start)
+    app.add_event_handler("shutdown", pg_listener.stop)
+
     return app
 
 app = create_app()
\ No newline at end of file
@@ -1,118 +1,131 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-import psycopg2
-from app.core.config import get_settings
+from app.db.context import get_db_cursor
+from app.db.keyset import paginate
+from app.services.exports import export_response
+from app.services.login_log_search import (
+    PAGE_SIZE, EXPORT_COLUMNS, login_log_filter, login_log_page_query, login_log_export_query,
+    filter_query_string,
+)
+from app.services.clinic_directory import clinic_directory
+from app.services.geoip import geoip
+from app.services.sessions import session_store
+from app.services.user_context import require_admin
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin", tags=["admin"])
 templates = Jinja2Templates(directory="templates")
 
-def get_db_connection():
-    """Database connection using POSTGRES_DSN"""
-    try:
-        cfg = get_settings()
-        # Convert PostgresDsn object to string
-        dsn_str = str(cfg.POSTGRES_DSN)
-        conn = psycopg2.connect(dsn_str, connect_timeout=10)
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
-
 @router.get("/users", response_class=HTMLResponse)
-def admin_users(request: Request):
+def admin_users(request: Request, user: dict = Depends(require_admin)):
     """Admin user management page"""
-    # Check admin access
-    user = request.session.get("user")
-    if not user or user.get("role") != "admin":
-        return RedirectResponse("/login")
-
-    conn = get_db_connection()
-    if not conn:
-        return HTMLResponse(content="<h1>Database connection failed</h1>", status_code=500)
-
     try:
-        cursor = conn.cursor()
         query = """
         SELECT u.username, u.full_name, u.email, u.phone, u.role,
-               c.name as clinic_name, u.last_login_at, u.last_login_ip,
+               COALESCE(c.name, 'All Clinics') as clinic_name, u.last_login_at, u.last_login_ip,
                u.last_login_city, u.last_login_country, u.is_active
         FROM users u
         LEFT JOIN clinics c ON u.clinic_id = c.id
         ORDER BY u.last_login_at DESC NULLS LAST
         """
-        cursor.execute(query)
-        users = cursor.fetchall()
-        conn.close()
-
-        users_list = [
-            {
-                "username": user_row[0],
-                "full_name": user_row[1],
-                "email": user_row[2],
-                "phone": user_row[3],
-                "role": user_row[4],
-                "clinic_name": user_row[5] or "All Clinics",
-                "last_login_at": user_row[6],
-                "last_login_ip": user_row[7],
-                "last_login_city": user_row[8],
-                "last_login_country": user_row[9],
-                "is_active": user_row[10]
-            }
-            for user_row in users
-        ]
+        with get_db_cursor() as cursor:
+            cursor.execute(query)
+            users = cursor.fetchall()
 
         return templates.TemplateResponse(
             "admin_users.html",
-            {"request": request, "users": users_list, "user": user}
+            {"request": request, "users": users, "user": user}
         )
     except Exception as e:
         logger.error(f"Database query failed: {e}")
         return HTMLResponse(content=f"<h1>Error fetching users: {e}</h1>", status_code=500)
 
 @router.get("/login-logs", response_class=HTMLResponse)
-def admin_login_logs(request: Request):
-    """Admin login logs page"""
-    # Check admin access
-    user = request.session.get("user")
-    if not user or user.get("role") != "admin":
-        return RedirectResponse("/login")
-
-    conn = get_db_connection()
-    if not conn:
-        return HTMLResponse(content="<h1>Database connection failed</h1>", status_code=500)
-
+def admin_login_logs(
+    request: Request,
+    username: str = "",
+    ip: str = "",
+    success: str = "",
+    country: str = "",
+    since: str = "",
+    until: str = "",
+    page: str = "",
+    user: dict = Depends(require_admin)
+):
+    """Admin login logs explorer: filters plus keyset pages, newest first"""
     try:
-        cursor = conn.cursor()
-        query = """
-        SELECT username, login_time, ip_address, city, country, success, user_agent
-        FROM login_logs
-        ORDER BY login_time DESC
-        LIMIT 100
-        """
-        cursor.execute(query)
-        logs = cursor.fetchall()
-        conn.close()
+        where, params, filters = login_log_filter(username, ip, success, country, since, until)
+        sql, sql_params, direction = login_log_page_query(where, params, page)
+    except ValueError as e:
+        return HTMLResponse(content=f"<h1>Invalid filter: {e}</h1>", status_code=400)
 
-        logs_list = [
-            {
-                "username": log[0],
-                "login_time": log[1],
-                "ip_address": log[2],
-                "city": log[3],
-                "country": log[4],
-                "success": log[5],
-                "user_agent": log[6]
-            }
-            for log in logs
-        ]
+    try:
+        # Each filter has a (column, login_time, id) index and login_logs is
+        # partitioned by month, so a page stops after PAGE_SIZE + 1 index rows
+        # from the newest matching partition(s)
+        with get_db_cursor() as cursor:
+            cursor.execute(sql, sql_params)
+            rows = cursor.fetchall()
+        logs, next_page, prev_page = paginate(rows, PAGE_SIZE, direction, bool(page), column="login_time")
 
         return templates.TemplateResponse(
             "admin_login_logs.html",
-            {"request": request, "logs": logs_list, "user": user}
+            {
+                "request": request,
+                "logs": logs,
+                "user": user,
+                "filters": filters,
+                "filter_query": filter_query_string(filters),
+                "next_page": next_page,
+                "prev_page": prev_page
+            }
         )
     except Exception as e:
         logger.error(f"Database query failed: {e}")
-        return HTMLResponse(content=f"<h1>Error fetching logs: {e}</h1>", status_code=500)
\ No newline at end of file
+        return HTMLResponse(content=f"<h1>Error fetching logs: {e}</h1>", status_code=500)
+
+@router.get("/login-logs/export")
+def export_login_logs(
+    request: Request,
+    username: str = "",
+    ip: str = "",
+    success: str = "",
+    country: str = "",
+    since: str = "",
+    until: str = "",
+    gzip: bool = False,
+    user: dict = Depends(require_admin)
+):
+    """Stream the filtered login logs as CSV from a server-side cursor"""
+    try:
+        where, params, _ = login_log_filter(username, ip, success, country, since, until)
+        sql, params = login_log_export_query(where, params)
+        return export_response("login_logs", sql, params, EXPORT_COLUMNS, "csv", gzip)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+@router.post("/clinics/refresh")
+def refresh_clinics(request: Request, user: dict = Depends(require_admin)):
+    """Drop the cached clinic directory after clinics are added or renamed"""
+    clinic_directory.invalidate()
+    clinic_directory.all()
+    return clinic_directory.stats()
+
+@router.post("/geoip/reload")
+def reload_geoip(request: Request, user: dict = Depends(require_admin)):
+    """Reload the GeoIP database file without restarting"""
+    if geoip.reload() is None:
+        return JSONResponse({"error": "Reload failed or already running", **geoip.stats()}, status_code=500)
+    return geoip.stats()
+
+@router.post("/users/{user_id}/sessions/revoke")
+async def revoke_user_sessions(request: Request, user_id: int, user: dict = Depends(require_admin)):
+    """Log a user out everywhere"""
+    try:
+        revoked = await session_store.revoke_user(user_id)
+        return {"user_id": user_id, "revoked": revoked}
+    except Exception as e:
+        logger.error(f"Session revoke failed: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
@@ -2,35 +2,19 @@ from fastapi import APIRouter, Request, HTTPException, Form
 from fastapi.responses import RedirectResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 import logging
-import requests
+import math
 
 from app.services.auth import authenticate_user, log_login_attempt, update_user_last_login
+from app.services.geoip import geoip
+from app.services.rate_limit import login_limiter
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 logger = logging.getLogger(__name__)
 
 def get_location_from_ip(ip):
-    try:
-        url = f"http://ip-api.com/json/{ip}"
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("status") == "success":
-            return {
-                "country": data.get("country"),
-                "region": data.get("regionName"),
-                "city": data.get("city"),
-                "lat": data.get("lat"),
-                "lon": data.get("lon"),
-                "isp": data.get("isp"),
-            }
-        else:
-            logger.warning(f"GeoIP API error: {data.get('message')}")
-            return None
-    except Exception as e:
-        logger.error(f"GeoIP API request failed: {e}")
-        return None
+    # Local database lookup; never touches the network (app/services/geoip.py)
+    return geoip.locate(ip)
 
 @router.get("/", response_class=HTMLResponse)
 def root(request: Request):
@@ -44,6 +28,16 @@ def login_page(request: Request):
 async def login(request: Request, username: str = Form(...), password: str = Form(...)):
     logger.info(f"🚀 LOGIN ATTEMPT: username='{username}'")
     client_host = request.client.host
+
+    # Shed brute-force traffic before any lookup, hashing or database write
+    wait = await login_limiter.check(client_host, username)
+    if wait:
+        retry_after = math.ceil(wait)
+        return templates.TemplateResponse("login.html", {
+            "request": request,
+            "error": f"Too many login attempts. Try again in {retry_after} seconds."
+        }, status_code=429, headers={"Retry-After": str(retry_after)})
+
     user_agent = request.headers.get("user-agent", "Unknown")
     location_data = get_location_from_ip(client_host)
     logger.info(f"User IP: {client_host}, Location: {location_data}")
@@ -55,7 +49,7 @@ async def login(request: Request, username: str = Form(...), password: str = For
             "error": "Username and password are required"
         })
 
-    user = authenticate_user(username, password)
+    user = await authenticate_user(username, password)
 
     if user:
         log_login_attempt(username, client_host, location_data, True, user_agent)
@@ -1,23 +1,54 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from app.services.dashboard import get_dashboard_stats
+from app.services.dashboard import get_dashboard_stats, get_clinic_breakdown, EMPTY_STATS
+from app.services.events import event_bus, format_sse
+from app.services.user_context import current_user, clinic_scope
+from typing import Optional
+import logging
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 @router.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request):
-    user = request.session.get("user")
-    if not user:
-        return RedirectResponse("/login")
-    total_patients, total_login_logs = get_dashboard_stats()
+def dashboard(request: Request, exact: bool = False, user: dict = Depends(current_user)):
+    try:
+        stats = get_dashboard_stats(exact)
+    except Exception as e:
+        logger.error(f"Error fetching dashboard stats: {e}")
+        stats = EMPTY_STATS
+    try:
+        # Same scope as the event stream: admins see every clinic
+        clinics = get_clinic_breakdown(clinic_scope(user))
+    except Exception as e:
+        logger.error(f"Error fetching clinic breakdown: {e}")
+        clinics = []
     return templates.TemplateResponse(
         "dashboard.html",
         {
             "request": request,
             "user": user,
-            "total_patients": total_patients,
-            "total_login_logs": total_login_logs
+            "clinic_stats": clinics,
+            **stats
         }
-    )
\ No newline at end of file
+    )
+
+@router.get("/dashboard/events")
+async def dashboard_events(request: Request, user: dict = Depends(current_user)):
+    """Server-Sent Events stream of the user's clinic's registrations and visits,
+    plus headline count changes from other clinics"""
+    last_event_id: Optional[int] = None
+    if request.headers.get("last-event-id", "").isdigit():
+        last_event_id = int(request.headers["last-event-id"])
+
+    async def stream():
+        yield "retry: 5000\n\n"
+        async for event in event_bus.subscribe(clinic_scope(user), last_event_id):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,24 +1,24 @@
 from fastapi import APIRouter
 import os
-import psycopg2
 from app.core.config import get_settings
+from app.db.async_context import get_async_cursor
+from app.db.batch import QueryBatch
+from app.db.pools import pool
+from app.services.table_counts import count_sql
+from app.services.cache import cache_stats
+from app.services.events import event_bus
+from app.services.geoip import geoip
+from app.services.login_audit import login_audit
+from app.services.rate_limit import login_limiter
+from app.services.sessions import session_store
+from app.services.user_context import user_contexts
+from app.db.notify import pg_listener
+from app.services.clinic_directory import clinic_directory
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["health"])
 
-def get_db_connection():
-    """Database connection using POSTGRES_DSN"""
-    try:
-        cfg = get_settings()
-        # Convert PostgresDsn object to string
-        dsn_str = str(cfg.POSTGRES_DSN)
-        conn = psycopg2.connect(dsn_str, connect_timeout=10)
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
-
 @router.get("/health")
 def health_check():
     """Application health check"""
@@ -30,38 +30,35 @@ def health_check():
     }
 
 @router.get("/db-test")
-def test_database():
+async def test_database(exact: bool = False):
     """Database connection and stats test"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return {"status": "❌ Database connection failed"}
-
-        cursor = conn.cursor()
-
         # Get basic stats
-        cursor.execute("SELECT COUNT(*) FROM users WHERE is_active = TRUE")
-        active_users = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM clinics")
-        clinics = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM patients")
-        patients = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM login_logs")
-        login_logs = cursor.fetchone()[0]
+        batch = QueryBatch()
+        batch.scalar("active_users", "SELECT COUNT(*) FROM users WHERE is_active = TRUE")
+        batch.scalar("clinics", "SELECT COUNT(*) FROM clinics")
+        patients_sql, patients_params, approximate = count_sql("patients", exact)
+        batch.scalar("patients", patients_sql, patients_params)
+        logs_sql, logs_params, _ = count_sql("login_logs", exact)
+        batch.scalar("login_logs", logs_sql, logs_params)
 
-        conn.close()
+        async with get_async_cursor() as cursor:
+            stats = await batch.run(cursor.connection)
 
         return {
             "status": "✅ Database connection successful",
-            "stats": {
-                "active_users": active_users,
-                "clinics": clinics,
-                "patients": patients,
-                "login_logs": login_logs
-            }
+            "stats": stats,
+            "counts_approximate": approximate,
+            "pool": pool.stats(),
+            "clinic_cache": clinic_directory.stats(),
+            "service_cache": cache_stats(),
+            "events": event_bus.stats(),
+            "geoip": geoip.stats(),
+            "login_audit": login_audit.stats(),
+            "login_rate_limit": login_limiter.stats(),
+            "sessions": session_store.stats(),
+            "user_contexts": user_contexts.stats(),
+            "notify_listener": pg_listener.stats()
         }
     except Exception as e:
         logger.error(f"Database test failed: {e}")
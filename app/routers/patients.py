@@ -1,34 +1,39 @@
-from fastapi import APIRouter, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Request, Form, HTTPException, UploadFile, File, Depends
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-import psycopg2
-from app.core.config import get_settings
+from app.db.context import get_db_cursor
+from app.db.async_context import get_async_cursor
+from app.db.batch import QueryBatch
+from app.db.rows import row_to_dict
+from app.db.keyset import keyset_query, paginate, NEXT
+from app.services.patient_search import find_patients
+from app.services.patient_suggest import suggest_index
+from app.services.patient_codes import patient_codes
+from app.services.patient_import import import_patients, detect_format
+from app.services.exports import export_filter, export_response
+from app.services.clinic_directory import clinic_directory
+from app.services.counters import counter_sql
+from app.services.events import event_bus
+from app.services.user_context import current_user, clinic_scope
+from typing import Optional
 import logging
 import json
+import io
+from collections import namedtuple
 from datetime import datetime, date
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/patients", tags=["patients"])
 templates = Jinja2Templates(directory="templates")
 
-def get_db_connection():
-    """Get database connection with improved error handling"""
-    try:
-        cfg = get_settings()
-        dsn_str = str(cfg.POSTGRES_DSN)
-        conn = psycopg2.connect(dsn_str, connect_timeout=10)
-        conn.autocommit = True
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
+PATIENTS_PAGE_SIZE = 20
+VISITS_PAGE_SIZE = 10
 
-def require_auth(request: Request):
-    """Check if user is authenticated"""
-    user = request.session.get("user")
-    if not user:
-        return RedirectResponse("/login")
-    return user
+# Visit history columns shared by the chart query and the visits fragment
+VISIT_COLUMNS = """v.id, v.visit_date, v.diagnosis, v.treatment, v.notes,
+                   COALESCE(u.full_name, 'Unknown') as doctor_name"""
+VisitRow = namedtuple("VisitRow", ["id", "visit_date", "diagnosis", "treatment", "notes", "doctor_name"])
 
 def safe_execute_query(cursor, query, params=None, fetch_one=False, fetch_all=False):
     """Safely execute database queries with error handling"""
@@ -41,74 +46,87 @@ def safe_execute_query(cursor, query, params=None, fetch_one=False, fetch_all=Fa
         return True
     except Exception as e:
         logger.error(f"Query execution failed: {e}")
+        # Pooled connections run inside a transaction; clear the aborted
+        # state so the remaining queries in this request can still run.
+        cursor.connection.rollback()
+        return None
+
+async def safe_execute_query_async(cursor, query, params=None, fetch_one=False, fetch_all=False):
+    """Async counterpart of safe_execute_query for get_async_cursor() cursors"""
+    try:
+        await cursor.execute(query, params)
+        if fetch_one:
+            return await cursor.fetchone()
+        elif fetch_all:
+            return await cursor.fetchall()
+        return True
+    except Exception as e:
+        logger.error(f"Query execution failed: {e}")
+        await cursor.connection.rollback()
         return None
 
+async def safe_run_batch(cursor, batch):
+    """Run a QueryBatch, falling back to its defaults if any statement fails"""
+    try:
+        return await batch.run(cursor.connection)
+    except Exception as e:
+        logger.error(f"Batch execution failed: {e}")
+        await cursor.connection.rollback()
+        return batch.defaults()
+
+def visit_from_json(visit):
+    """VisitRow from a json_agg() element; JSON carries visit_date as text"""
+    if visit["visit_date"]:
+        visit["visit_date"] = datetime.fromisoformat(visit["visit_date"])
+    return VisitRow(**visit)
+
+def patient_page_query(page, page_size, where="", params=()):
+    """Patient list query for one keyset page of ``page_size`` rows.
+
+    Fetches one extra row so paginate() can tell whether another page exists.
+    Returns (sql, params, direction).
+    """
+    page_where, page_params, order_by, direction = keyset_query(page)
+    conditions = [f"({c})" for c in (where, page_where) if c]
+    where_sql = "WHERE " + " AND ".join(conditions) if conditions else ""
+    sql = f"""
+        SELECT p.id, p.patient_id, p.full_name AS name, p.age, p.gender, p.phone, p.address,
+               COALESCE(c.name, 'Unknown') as clinic_name, p.created_at,
+               (SELECT COUNT(*) FROM visits v WHERE v.patient_id = p.id) AS visit_count
+        FROM patients p
+        LEFT JOIN clinics c ON p.clinic_id = c.id
+        {where_sql}
+        ORDER BY {order_by}
+        LIMIT %s
+    """
+    return sql, (*params, *page_params, page_size + 1), direction
+
 # 1. ROOT ROUTE - Patient List
 @router.get("/", response_class=HTMLResponse)
-def patients_list(request: Request):
+async def patients_list(request: Request, page: str = "", user: dict = Depends(current_user)):
     """Patient list page with analytics"""
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
 
-    conn = get_db_connection()
-    if not conn:
-        return HTMLResponse(content="<h1>Database connection failed</h1>", status_code=500)
+    try:
+        page_sql, page_params, direction = patient_page_query(page, PATIENTS_PAGE_SIZE)
+    except ValueError:
+        return HTMLResponse(content="<h1>Invalid page</h1>", status_code=400)
 
     try:
-        cursor = conn.cursor()
-
-        # Get patient statistics with safe execution
-        total_patients = 0
-        result = safe_execute_query(cursor, "SELECT COUNT(*) FROM patients", fetch_one=True)
-        if result:
-            total_patients = result[0]
-
-        today_registrations = 0
-        result = safe_execute_query(cursor, 
-            "SELECT COUNT(*) FROM patients WHERE DATE(created_at) = CURRENT_DATE", 
-            fetch_one=True)
-        if result:
-            today_registrations = result[0]
-
-        # Handle visits table gracefully
-        today_visits = 0
-        result = safe_execute_query(cursor,
-            "SELECT COUNT(DISTINCT patient_id) FROM visits WHERE DATE(visit_date) = CURRENT_DATE",
-            fetch_one=True)
-        if result:
-            today_visits = result[0]
-
-        # Get recent patients with proper error handling
-        patients_list = []
-        patients = safe_execute_query(cursor, """
-            SELECT p.id, p.patient_id, p.full_name, p.age, p.gender, p.phone, p.address,
-                   COALESCE(c.name, 'Unknown') as clinic_name, p.created_at
-            FROM patients p
-            LEFT JOIN clinics c ON p.clinic_id = c.id
-            ORDER BY p.created_at DESC
-            LIMIT 20
-        """, fetch_all=True)
-
-        if patients:
-            patients_list = [
-                {
-                    "id": patient[0],
-                    "patient_id": patient[1],
-                    "name": patient[2],  # full_name
-                    "age": patient[3],
-                    "gender": patient[4],
-                    "phone": patient[5],
-                    "address": patient[6],
-                    "clinic_name": patient[7],
-                    "created_at": patient[8],
-                    "visit_count": 0
-                }
-                for patient in patients
-            ]
-
-        cursor.close()
-        conn.close()
+        # Statistics and the current page are independent; send them together
+        batch = QueryBatch()
+        batch.scalar("total_patients", *counter_sql("patients_registered"), default=0)
+        batch.scalar("today_registrations", *counter_sql("patients_registered", "today"), default=0)
+        batch.scalar("today_visits", *counter_sql("visiting_patients", "today"), default=0)
+        batch.rows("patients", page_sql, page_params)
+
+        async with get_async_cursor() as cursor:
+            results = await safe_run_batch(cursor, batch)
+
+        total_patients = results["total_patients"]
+        today_registrations = results["today_registrations"]
+        today_visits = results["today_visits"]
+        patients_list, next_page, prev_page = paginate(
+            results["patients"], PATIENTS_PAGE_SIZE, direction, bool(page))
 
         return templates.TemplateResponse(
             "patients.html",
@@ -118,38 +136,22 @@ def patients_list(request: Request):
                 "total_patients": total_patients,
                 "today_registrations": today_registrations,
                 "today_visits": today_visits,
-                "patients": patients_list
+                "patients": patients_list,
+                "next_page": next_page,
+                "prev_page": prev_page
             }
         )
     except Exception as e:
         logger.error(f"Patients list error: {e}")
-        if conn:
-            conn.close()
         return HTMLResponse(content=f"<h1>Error loading patients: {e}</h1>", status_code=500)
 
 # 2. SPECIFIC ROUTES (must come before dynamic routes)
 @router.get("/new", response_class=HTMLResponse)
-def new_patient_form(request: Request):
+def new_patient_form(request: Request, user: dict = Depends(current_user)):
     """New patient registration form"""
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
-
-    conn = get_db_connection()
-    if not conn:
-        return HTMLResponse(content="<h1>Database connection failed</h1>", status_code=500)
 
     try:
-        cursor = conn.cursor()
-
-        # Get clinics with safe execution
-        clinics = [(1, "Default Clinic")]  # Default fallback
-        result = safe_execute_query(cursor, "SELECT id, name FROM clinics ORDER BY name", fetch_all=True)
-        if result:
-            clinics = result
-
-        cursor.close()
-        conn.close()
+        clinics = clinic_directory.all() or [(1, "Default Clinic")]  # Default fallback
 
         return templates.TemplateResponse(
             "patient_form.html",
@@ -162,12 +164,10 @@ def new_patient_form(request: Request):
         )
     except Exception as e:
         logger.error(f"New patient form error: {e}")
-        if conn:
-            conn.close()
         return HTMLResponse(content=f"<h1>Error loading form: {e}</h1>", status_code=500)
 
 @router.post("/create")
-def create_patient(
+async def create_patient(
     request: Request,
     name: str = Form(...),
     age: int = Form(...),
@@ -176,104 +176,127 @@ def create_patient(
     address: str = Form(""),
     clinic_id: int = Form(...),
     emergency_contact: str = Form(""),
-    emergency_phone: str = Form("")
+    emergency_phone: str = Form(""),
+    user: dict = Depends(current_user)
 ):
     """Create new patient with improved error handling"""
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
-
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Database connection failed")
 
     try:
-        cursor = conn.cursor()
-
-        # Generate unique patient_id
-        count_result = safe_execute_query(cursor, "SELECT COUNT(*) FROM patients", fetch_one=True)
-        count = count_result[0] if count_result else 0
-        patient_id_str = f"PAT{count + 1:06d}"
-
-        # Insert new patient
-        result = safe_execute_query(cursor, """
-            INSERT INTO patients (patient_id, full_name, age, gender, phone, address, 
-                                emergency_contact, emergency_phone, clinic_id, created_by, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (patient_id_str, name, age, gender, phone or None, address or None, 
-              emergency_contact or None, emergency_phone or None, clinic_id, 
-              user.get("id", 1), datetime.now()), fetch_one=True)
-
-        if not result:
-            raise HTTPException(status_code=500, detail="Failed to create patient")
-
-        new_patient_id = result[0]
-        cursor.close()
-        conn.close()
-
+        async with get_async_cursor() as cursor:
+            # Generate unique patient_id from the code sequence
+            patient_id_str = await patient_codes.allocate_async(cursor, clinic_id)
+
+            # Insert new patient
+            result = await safe_execute_query_async(cursor, """
+                INSERT INTO patients (patient_id, full_name, age, gender, phone, address, 
+                                    emergency_contact, emergency_phone, clinic_id, created_by, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (patient_id_str, name, age, gender, phone or None, address or None, 
+                  emergency_contact or None, emergency_phone or None, clinic_id, 
+                  user.get("id", 1), datetime.now()), fetch_one=True)
+
+            if not result:
+                raise HTTPException(status_code=500, detail="Failed to create patient")
+
+            new_patient_id = result.id
+
+        suggest_index.add(new_patient_id, patient_id_str, name, phone or None, clinic_id)
+        event_bus.publish("patient_registered", {"id": new_patient_id}, clinic_id,
+                          counts={"patients": 1})
         return RedirectResponse(f"/patients/{new_patient_id}", status_code=303)
     except Exception as e:
         logger.error(f"Create patient error: {e}")
-        if conn:
-            conn.close()
         raise HTTPException(status_code=500, detail=f"Error creating patient: {e}")
 
+@router.post("/import")
+async def import_patients_upload(
+    request: Request,
+    file: UploadFile = File(...),
+    clinic_id: int = Form(...),
+    format: str = Form(""),
+    user: dict = Depends(current_user)
+):
+    """Bulk import patients from a CSV or NDJSON upload"""
+    # Clinic staff can only import into their own clinic
+    clinic_id = clinic_scope(user, clinic_id)
+
+    fmt = format or detect_format(file.filename)
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        # COPY and the merge are blocking psycopg2 calls
+        result = await run_in_threadpool(import_patients, stream, fmt, clinic_id, user.get("id"))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error(f"Patient import error: {e}")
+        return JSONResponse({"error": f"Import failed: {e}"}, status_code=500)
+    finally:
+        stream.detach()
+    if result["imported"]:
+        event_bus.publish("patients_imported", {"count": result["imported"]}, clinic_id,
+                          counts={"patients": result["imported"]})
+    return JSONResponse(result)
+
+PATIENT_EXPORT_COLUMNS = ["id", "patient_id", "full_name", "age", "gender", "phone", "address",
+                          "emergency_contact", "emergency_phone", "clinic_id", "clinic_name",
+                          "created_at", "updated_at"]
+
+@router.get("/export")
+def export_patients(
+    request: Request,
+    format: str = "csv",
+    clinic_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    gzip: bool = False,
+    user: dict = Depends(current_user)
+):
+    """Stream all patients (registered in the date range) as CSV or NDJSON"""
+    # Clinic staff only ever export their own clinic's patients
+    clinic_id = clinic_scope(user, clinic_id)
+    where, params = export_filter("p.created_at", clinic_id, date_from, date_to, "p.clinic_id")
+    sql = f"""
+        SELECT p.id, p.patient_id, p.full_name, p.age, p.gender, p.phone, p.address,
+               p.emergency_contact, p.emergency_phone, p.clinic_id, c.name,
+               p.created_at, p.updated_at
+        FROM patients p
+        LEFT JOIN clinics c ON p.clinic_id = c.id
+        {where}
+        ORDER BY p.id
+    """
+    try:
+        return export_response("patients", sql, params, PATIENT_EXPORT_COLUMNS, format, gzip)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
 @router.get("/search", response_class=HTMLResponse)
-def search_patients(request: Request, q: str = ""):
+async def search_patients(request: Request, q: str = "", page: str = "", user: dict = Depends(current_user)):
     """Search patients by name, phone, or patient ID"""
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
 
-    conn = get_db_connection()
-    if not conn:
-        return HTMLResponse(content="<h1>Database connection failed</h1>", status_code=500)
+    if q.strip():
+        # Ranked top-K results; relevance order doesn't page by created_at
+        try:
+            patients_list = await find_patients(q)
+        except Exception as e:
+            logger.error(f"Search patients error: {e}")
+            return HTMLResponse(content=f"<h1>Search error: {e}</h1>", status_code=500)
+        next_page = prev_page = None
+    else:
+        try:
+            page_sql, page_params, direction = patient_page_query(page, PATIENTS_PAGE_SIZE)
+        except ValueError:
+            return HTMLResponse(content="<h1>Invalid page</h1>", status_code=400)
+        try:
+            async with get_async_cursor() as cursor:
+                patients = await safe_execute_query_async(cursor, page_sql, page_params, fetch_all=True)
+        except Exception as e:
+            logger.error(f"Search patients error: {e}")
+            return HTMLResponse(content=f"<h1>Search error: {e}</h1>", status_code=500)
+        patients_list, next_page, prev_page = paginate(
+            patients or [], PATIENTS_PAGE_SIZE, direction, bool(page))
 
     try:
-        cursor = conn.cursor()
-
-        if q.strip():
-            patients = safe_execute_query(cursor, """
-                SELECT p.id, p.patient_id, p.full_name, p.age, p.gender, p.phone, p.address,
-                       COALESCE(c.name, 'Unknown') as clinic_name, p.created_at
-                FROM patients p
-                LEFT JOIN clinics c ON p.clinic_id = c.id
-                WHERE p.full_name ILIKE %s OR p.phone ILIKE %s OR p.patient_id ILIKE %s
-                ORDER BY p.created_at DESC
-                LIMIT 50
-            """, (f"%{q}%", f"%{q}%", f"%{q}%"), fetch_all=True)
-        else:
-            patients = safe_execute_query(cursor, """
-                SELECT p.id, p.patient_id, p.full_name, p.age, p.gender, p.phone, p.address,
-                       COALESCE(c.name, 'Unknown') as clinic_name, p.created_at
-                FROM patients p
-                LEFT JOIN clinics c ON p.clinic_id = c.id
-                ORDER BY p.created_at DESC
-                LIMIT 20
-            """, fetch_all=True)
-
-        patients_list = []
-        if patients:
-            patients_list = [
-                {
-                    "id": patient[0],
-                    "patient_id": patient[1],
-                    "name": patient[2],
-                    "age": patient[3],
-                    "gender": patient[4],
-                    "phone": patient[5],
-                    "address": patient[6],
-                    "clinic_name": patient[7],
-                    "created_at": patient[8],
-                    "visit_count": 0
-                }
-                for patient in patients
-            ]
-
-        cursor.close()
-        conn.close()
-
         return templates.TemplateResponse(
             "patients.html",
             {
@@ -283,59 +306,41 @@ def search_patients(request: Request, q: str = ""):
                 "today_registrations": 0,
                 "today_visits": 0,
                 "patients": patients_list,
-                "search_query": q
+                "search_query": q,
+                "next_page": next_page,
+                "prev_page": prev_page
             }
         )
     except Exception as e:
         logger.error(f"Search patients error: {e}")
-        if conn:
-            conn.close()
         return HTMLResponse(content=f"<h1>Search error: {e}</h1>", status_code=500)
 
+@router.get("/suggest")
+async def suggest_patients(request: Request, q: str = "", limit: int = 10,
+                           user: dict = Depends(current_user)):
+    """Type-ahead suggestions from the in-memory prefix index, for the user's clinic"""
+    limit = max(1, min(limit, 25))
+    return {"ready": suggest_index.ready, "results": suggest_index.lookup(q, limit, clinic_scope(user))}
+
 # 3. DYNAMIC ROUTES (must come last)
 @router.get("/{patient_id}/edit", response_class=HTMLResponse)
-def edit_patient_form(request: Request, patient_id: int):
+def edit_patient_form(request: Request, patient_id: int, user: dict = Depends(current_user)):
     """Edit patient form"""
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
-
-    conn = get_db_connection()
-    if not conn:
-        return HTMLResponse(content="<h1>Database connection failed</h1>", status_code=500)
 
     try:
-        cursor = conn.cursor()
+        with get_db_cursor() as cursor:
+            # Get patient details
+            patient = safe_execute_query(cursor, """
+                SELECT id, patient_id, full_name AS name, age, gender, phone, address,
+                       emergency_contact, emergency_phone, clinic_id
+                FROM patients
+                WHERE id = %s
+            """, (patient_id,), fetch_one=True)
 
-        # Get patient details
-        patient = safe_execute_query(cursor, "SELECT * FROM patients WHERE id = %s", (patient_id,), fetch_one=True)
-
-        if not patient:
-            cursor.close()
-            conn.close()
-            return HTMLResponse(content="<h1>Patient not found</h1>", status_code=404)
+            if not patient:
+                return HTMLResponse(content="<h1>Patient not found</h1>", status_code=404)
 
-        # Get clinics
-        clinics = [(1, "Default Clinic")]
-        result = safe_execute_query(cursor, "SELECT id, name FROM clinics ORDER BY name", fetch_all=True)
-        if result:
-            clinics = result
-
-        cursor.close()
-        conn.close()
-
-        patient_data = {
-            "id": patient[0],
-            "patient_id": patient[1],
-            "name": patient[2],  # full_name
-            "age": patient[3],
-            "gender": patient[4],
-            "phone": patient[5],
-            "address": patient[6],
-            "emergency_contact": patient[7],
-            "emergency_phone": patient[8],
-            "clinic_id": patient[9]
-        }
+        clinics = clinic_directory.all() or [(1, "Default Clinic")]
 
         return templates.TemplateResponse(
             "patient_form.html",
@@ -343,13 +348,11 @@ def edit_patient_form(request: Request, patient_id: int):
                 "request": request,
                 "user": user,
                 "clinics": clinics,
-                "patient": patient_data
+                "patient": patient
             }
         )
     except Exception as e:
         logger.error(f"Edit patient form error: {e}")
-        if conn:
-            conn.close()
         return HTMLResponse(content=f"<h1>Error loading patient: {e}</h1>", status_code=500)
 
 @router.post("/{patient_id}/update")
@@ -363,121 +366,75 @@ def update_patient(
     address: str = Form(""),
     clinic_id: int = Form(...),
     emergency_contact: str = Form(""),
-    emergency_phone: str = Form("")
+    emergency_phone: str = Form(""),
+    user: dict = Depends(current_user)
 ):
     """Update patient with improved error handling"""
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
-
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Database connection failed")
 
     try:
-        cursor = conn.cursor()
-
-        result = safe_execute_query(cursor, """
-            UPDATE patients 
-            SET full_name = %s, age = %s, gender = %s, phone = %s, address = %s,
-                clinic_id = %s, emergency_contact = %s, emergency_phone = %s,
-                updated_at = %s
-            WHERE id = %s
-        """, (name, age, gender, phone or None, address or None, clinic_id,
-              emergency_contact or None, emergency_phone or None,
-              datetime.now(), patient_id))
-
-        if not result:
-            raise HTTPException(status_code=500, detail="Failed to update patient")
-
-        cursor.close()
-        conn.close()
-
+        with get_db_cursor() as cursor:
+            result = safe_execute_query(cursor, """
+                UPDATE patients 
+                SET full_name = %s, age = %s, gender = %s, phone = %s, address = %s,
+                    clinic_id = %s, emergency_contact = %s, emergency_phone = %s,
+                    updated_at = %s
+                WHERE id = %s
+            """, (name, age, gender, phone or None, address or None, clinic_id,
+                  emergency_contact or None, emergency_phone or None,
+                  datetime.now(), patient_id))
+
+            if not result:
+                raise HTTPException(status_code=500, detail="Failed to update patient")
+
+        suggest_index.add(patient_id, None, name, phone or None, clinic_id)
         return RedirectResponse(f"/patients/{patient_id}", status_code=303)
     except Exception as e:
         logger.error(f"Update patient error: {e}")
-        if conn:
-            conn.close()
         raise HTTPException(status_code=500, detail=f"Error updating patient: {e}")
 
 @router.get("/{patient_id}", response_class=HTMLResponse)
-def patient_detail(request: Request, patient_id: int):
+async def patient_detail(request: Request, patient_id: int, user: dict = Depends(current_user)):
     """Patient detail page with comprehensive information"""
     logger.info(f"Accessing patient detail for ID: {patient_id}")
 
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
-
-    conn = get_db_connection()
-    if not conn:
-        logger.error("Database connection failed in patient detail")
-        return HTMLResponse(content="<h1>Database connection failed</h1>", status_code=500)
-
     try:
-        cursor = conn.cursor()
-
-        # Get patient details with clinic information
+        # Patient, visit count and the latest visits in one query
         logger.info(f"Querying for patient ID: {patient_id}")
-        patient = safe_execute_query(cursor, """
-            SELECT p.id, p.patient_id, p.full_name, p.age, p.gender, p.phone, p.address,
-                   p.emergency_contact, p.emergency_phone, p.clinic_id, p.created_by, p.created_at, p.updated_at,
-                   COALESCE(c.name, 'Unknown') as clinic_name
-            FROM patients p
-            LEFT JOIN clinics c ON p.clinic_id = c.id
-            WHERE p.id = %s
-        """, (patient_id,), fetch_one=True)
+        async with get_async_cursor() as cursor:
+            patient = await safe_execute_query_async(cursor, f"""
+                SELECT p.id, p.patient_id, p.full_name AS name, p.age, p.gender, p.phone, p.address,
+                       p.emergency_contact, p.emergency_phone, p.clinic_id, p.created_by, p.created_at, p.updated_at,
+                       COALESCE(c.name, 'Unknown') as clinic_name,
+                       vc.visit_count, rv.recent_visits
+                FROM patients p
+                LEFT JOIN clinics c ON p.clinic_id = c.id
+                CROSS JOIN LATERAL (
+                    SELECT COUNT(*) AS visit_count FROM visits WHERE patient_id = p.id
+                ) vc
+                CROSS JOIN LATERAL (
+                    SELECT COALESCE(json_agg(recent ORDER BY recent.visit_date DESC, recent.id DESC),
+                                    '[]') AS recent_visits
+                    FROM (
+                        SELECT {VISIT_COLUMNS}
+                        FROM visits v
+                        LEFT JOIN users u ON v.doctor_id = u.id
+                        WHERE v.patient_id = p.id
+                        ORDER BY v.visit_date DESC, v.id DESC
+                        LIMIT %s
+                    ) recent
+                ) rv
+                WHERE p.id = %s
+            """, (VISITS_PAGE_SIZE + 1, patient_id), fetch_one=True)
 
         logger.info(f"Patient query result: {patient is not None}")
 
         if not patient:
-            cursor.close()
-            conn.close()
             logger.warning(f"No patient found with ID: {patient_id}")
             return HTMLResponse(content="<h1>Patient not found</h1>", status_code=404)
 
-        # Get patient visits (handle gracefully if visits table doesn't exist)
-        visits = []
-        visits_result = safe_execute_query(cursor, """
-            SELECT v.id, v.visit_date, v.diagnosis, v.treatment, v.notes,
-                   COALESCE(u.full_name, 'Unknown') as doctor_name
-            FROM visits v
-            LEFT JOIN users u ON v.doctor_id = u.id
-            WHERE v.patient_id = %s
-            ORDER BY v.visit_date DESC
-        """, (patient_id,), fetch_all=True)
-
-        if visits_result:
-            visits = [
-                {
-                    "id": visit[0],
-                    "visit_date": visit[1],
-                    "diagnosis": visit[2],
-                    "treatment": visit[3],
-                    "notes": visit[4],
-                    "doctor_name": visit[5]
-                }
-                for visit in visits_result
-            ]
-
-        cursor.close()
-        conn.close()
-
-        patient_data = {
-            "id": patient[0],
-            "patient_id": patient[1],
-            "name": patient[2],
-            "age": patient[3],
-            "gender": patient[4],
-            "phone": patient[5],
-            "address": patient[6],
-            "emergency_contact": patient[7],
-            "emergency_phone": patient[8],
-            "clinic_id": patient[9],
-            "created_at": patient[11],
-            "updated_at": patient[12],
-            "clinic_name": patient[13]
-        }
+        visits, next_page, _ = paginate(
+            [visit_from_json(v) for v in patient.recent_visits],
+            VISITS_PAGE_SIZE, NEXT, False, column="visit_date")
 
         logger.info(f"Successfully loaded patient data for ID: {patient_id}")
 
@@ -486,61 +443,76 @@ def patient_detail(request: Request, patient_id: int):
             {
                 "request": request,
                 "user": user,
-                "patient": patient_data,
-                "visits": visits
+                "patient": patient,
+                "patient_id": patient.id,
+                "visits": visits,
+                "next_page": next_page
             }
         )
     except Exception as e:
         logger.error(f"Patient detail error: {e}")
-        if conn:
-            conn.close()
         return HTMLResponse(content=f"<h1>Error loading patient details: {e}</h1>", status_code=500)
 
-@router.get("/{patient_id}/visit/new", response_class=HTMLResponse)
-def new_visit_form(request: Request, patient_id: int):
-    """New visit form for a patient"""
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
+@router.get("/{patient_id}/visits", response_class=HTMLResponse)
+async def patient_visits(request: Request, patient_id: int, page: str = "", user: dict = Depends(current_user)):
+    """Older visits for the patient chart, as an HTML fragment"""
 
-    conn = get_db_connection()
-    if not conn:
-        return HTMLResponse(content="<h1>Database connection failed</h1>", status_code=500)
+    try:
+        page_where, page_params, order_by, direction = keyset_query(page, alias="v", column="visit_date")
+    except ValueError:
+        return HTMLResponse(content="Invalid page", status_code=400)
 
     try:
-        cursor = conn.cursor()
+        async with get_async_cursor() as cursor:
+            await cursor.execute(f"""
+                SELECT {VISIT_COLUMNS}
+                FROM visits v
+                LEFT JOIN users u ON v.doctor_id = u.id
+                WHERE v.patient_id = %s {"AND " + page_where if page_where else ""}
+                ORDER BY {order_by}
+                LIMIT %s
+            """, (patient_id, *page_params, VISITS_PAGE_SIZE + 1))
+            rows = await cursor.fetchall()
+
+        visits, next_page, _ = paginate(rows, VISITS_PAGE_SIZE, direction, bool(page), column="visit_date")
 
-        # Get patient details
-        cursor.execute("SELECT id, patient_id, full_name FROM patients WHERE id = %s", (patient_id,))
-        patient = cursor.fetchone()
+        return templates.TemplateResponse(
+            "patient_visits.html",
+            {
+                "request": request,
+                "patient_id": patient_id,
+                "visits": visits,
+                "next_page": next_page
+            }
+        )
+    except Exception as e:
+        logger.error(f"Patient visits error: {e}")
+        return HTMLResponse(content=f"Error loading visits: {e}", status_code=500)
 
-        if not patient:
-            cursor.close()
-            conn.close()
-            return HTMLResponse(content="<h1>Patient not found</h1>", status_code=404)
+@router.get("/{patient_id}/visit/new", response_class=HTMLResponse)
+def new_visit_form(request: Request, patient_id: int, user: dict = Depends(current_user)):
+    """New visit form for a patient"""
 
-        cursor.close()
-        conn.close()
+    try:
+        with get_db_cursor() as cursor:
+            # Get patient details
+            cursor.execute("SELECT id, patient_id, full_name AS name FROM patients WHERE id = %s", (patient_id,))
+            patient = cursor.fetchone()
 
-        patient_data = {
-            "id": patient[0],
-            "patient_id": patient[1],
-            "name": patient[2]
-        }
+        if not patient:
+            return HTMLResponse(content="<h1>Patient not found</h1>", status_code=404)
 
         return templates.TemplateResponse(
             "visit_form.html",
             {
                 "request": request, 
                 "user": user, 
-                "patient": patient_data,
+                "patient": patient,
                 "today": date.today().isoformat()
             }
         )
     except Exception as e:
         logger.error(f"New visit form error: {e}")
-        if conn:
-            conn.close()
         return HTMLResponse(content=f"<h1>Error: {e}</h1>", status_code=500)
 
 @router.post("/{patient_id}/visit/create")
@@ -560,20 +532,12 @@ def create_visit(
     pulse: str = Form(""),
     weight: str = Form(""),
     height: str = Form(""),
-    oxygen_saturation: str = Form("")
+    oxygen_saturation: str = Form(""),
+    user: dict = Depends(current_user)
 ):
     """Create new visit"""
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
-
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Database connection failed")
 
     try:
-        cursor = conn.cursor()
-
         # Parse dates
         visit_datetime = datetime.strptime(visit_date, "%Y-%m-%d")
         follow_up = None
@@ -591,55 +555,48 @@ def create_visit(
 
         vital_signs_json = json.dumps(vital_signs) if vital_signs else None
 
-        cursor.execute("""
-            INSERT INTO visits (
-                patient_id, doctor_id, clinic_id, visit_date, visit_type,
-                chief_complaint, diagnosis, treatment, notes, vital_signs,
-                follow_up_date, created_at
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
-            patient_id, user.get("id", 1), user.get("clinic_id", 1), 
-            visit_datetime, visit_type, chief_complaint, diagnosis, 
-            treatment, notes, vital_signs_json, follow_up, datetime.now()
-        ))
-
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO visits (
+                    patient_id, doctor_id, clinic_id, visit_date, visit_type,
+                    chief_complaint, diagnosis, treatment, notes, vital_signs,
+                    follow_up_date, created_at
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (
+                patient_id, user.get("id", 1), user.get("clinic_id", 1), 
+                visit_datetime, visit_type, chief_complaint, diagnosis, 
+                treatment, notes, vital_signs_json, follow_up, datetime.now()
+            ))
+
+            result = cursor.fetchone()
 
         if not result:
             raise HTTPException(status_code=500, detail="Failed to create visit")
 
+        today = visit_datetime.date() == date.today()
+        event_bus.publish("visit_recorded", {"id": result.id, "patient_id": patient_id, "today": today},
+                          user.get("clinic_id", 1), counts={"today_visits": 1} if today else None)
+
         return RedirectResponse(f"/patients/{patient_id}", status_code=303)
     except Exception as e:
         logger.error(f"Create visit error: {e}")
-        if conn:
-            conn.close()
         raise HTTPException(status_code=500, detail=f"Error creating visit: {e}")
 
 # Additional utility route for debugging
 @router.get("/debug/{patient_id}")
 def debug_patient(request: Request, patient_id: int):
     """Debug route to check patient data"""
-    conn = get_db_connection()
-    if not conn:
-        return {"error": "Database connection failed"}
-
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
-        patient = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with get_db_cursor() as cursor:
+            cursor.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
+            patient = cursor.fetchone()
 
         return {
             "patient_id": patient_id,
             "found": patient is not None,
-            "data": patient if patient else None
+            "data": row_to_dict(patient)
         }
     except Exception as e:
-        if conn:
-            conn.close()
         return {"error": str(e)}
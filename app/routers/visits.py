@@ -1,133 +1,108 @@
-from fastapi import APIRouter, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Request, Form, HTTPException, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-import psycopg2
-from app.core.config import get_settings
+from app.db.context import get_db_cursor
+from app.services.exports import export_filter, export_response
+from app.services.user_context import current_user, clinic_scope
+from typing import Optional
 import logging
 import json
-from datetime import datetime
+from datetime import datetime, date
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/visits", tags=["visits"])
 templates = Jinja2Templates(directory="templates")
 
-def get_db_connection():
-    try:
-        cfg = get_settings()
-        dsn_str = str(cfg.POSTGRES_DSN)
-        conn = psycopg2.connect(dsn_str, connect_timeout=10)
-        conn.autocommit = True
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        return None
+VISIT_EXPORT_COLUMNS = ["id", "patient_id", "patient_code", "patient_name", "doctor_id", "doctor_name",
+                        "clinic_id", "clinic_name", "visit_date", "visit_type", "chief_complaint",
+                        "diagnosis", "treatment", "notes", "vital_signs", "status", "follow_up_date",
+                        "created_at"]
 
-def require_auth(request: Request):
-    user = request.session.get("user")
-    if not user:
-        return RedirectResponse("/login")
-    return user
+@router.get("/export")
+def export_visits(
+    request: Request,
+    format: str = "csv",
+    clinic_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    gzip: bool = False,
+    user: dict = Depends(current_user)
+):
+    """Stream visits in the date range as CSV or NDJSON"""
+    # Clinic staff only ever export their own clinic's visits
+    clinic_id = clinic_scope(user, clinic_id)
+    where, params = export_filter("v.visit_date", clinic_id, date_from, date_to, "v.clinic_id")
+    sql = f"""
+        SELECT v.id, v.patient_id, p.patient_id, p.full_name, v.doctor_id, u.full_name,
+               v.clinic_id, c.name, v.visit_date, v.visit_type, v.chief_complaint,
+               v.diagnosis, v.treatment, v.notes, v.vital_signs::text, v.status, v.follow_up_date,
+               v.created_at
+        FROM visits v
+        LEFT JOIN patients p ON v.patient_id = p.id
+        LEFT JOIN users u ON v.doctor_id = u.id
+        LEFT JOIN clinics c ON v.clinic_id = c.id
+        {where}
+        ORDER BY v.id
+    """
+    try:
+        return export_response("visits", sql, params, VISIT_EXPORT_COLUMNS, format, gzip)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
 
 @router.get("/{visit_id}", response_class=HTMLResponse)
-def visit_detail(request: Request, visit_id: int):
+def visit_detail(request: Request, visit_id: int, user: dict = Depends(current_user)):
     """Visit detail page"""
-    user = require_auth(request)
-    if isinstance(user, RedirectResponse):
-        return user
-
-    conn = get_db_connection()
-    if not conn:
-        return HTMLResponse(content="<h1>Database connection failed</h1>", status_code=500)
 
     try:
-        cursor = conn.cursor()
-        
-        # Get visit details
-        query = """
-            SELECT v.*, p.full_name as patient_name, p.patient_id,
-                   COALESCE(u.full_name, 'Unknown') as doctor_name,
-                   c.name as clinic_name
-            FROM visits v
-            LEFT JOIN patients p ON v.patient_id = p.id
-            LEFT JOIN users u ON v.doctor_id = u.id
-            LEFT JOIN clinics c ON v.clinic_id = c.id
-            WHERE v.id = %s
-        """
-        cursor.execute(query, (visit_id,))
-        visit = cursor.fetchone()
-        
-        if not visit:
-            cursor.close()
-            conn.close()
-            return HTMLResponse(content="<h1>Visit not found</h1>", status_code=404)
+        with get_db_cursor() as cursor:
+            # Get visit details
+            query = """
+                SELECT v.id, v.patient_id, v.doctor_id, v.clinic_id, v.visit_date,
+                       v.visit_type, v.chief_complaint, v.diagnosis, v.treatment, v.notes,
+                       v.vital_signs, v.status, v.follow_up_date, v.created_at, v.updated_at,
+                       p.full_name as patient_name, p.patient_id as patient_code,
+                       COALESCE(u.full_name, 'Unknown') as doctor_name,
+                       c.name as clinic_name
+                FROM visits v
+                LEFT JOIN patients p ON v.patient_id = p.id
+                LEFT JOIN users u ON v.doctor_id = u.id
+                LEFT JOIN clinics c ON v.clinic_id = c.id
+                WHERE v.id = %s
+            """
+            cursor.execute(query, (visit_id,))
+            visit = cursor.fetchone()
 
-        # Get prescriptions for this visit
-        prescription_query = """
-            SELECT id, medicine_name, dosage, frequency, duration, instructions, quantity, status
-            FROM prescriptions 
-            WHERE visit_id = %s
-            ORDER BY prescribed_date DESC
-        """
-        cursor.execute(prescription_query, (visit_id,))
-        prescriptions = cursor.fetchall()
+            if not visit:
+                return HTMLResponse(content="<h1>Visit not found</h1>", status_code=404)
 
-        cursor.close()
-        conn.close()
+            # Get prescriptions for this visit
+            prescription_query = """
+                SELECT id, medicine_name, dosage, frequency, duration, instructions, quantity, status
+                FROM prescriptions 
+                WHERE visit_id = %s
+                ORDER BY prescribed_date DESC
+            """
+            cursor.execute(prescription_query, (visit_id,))
+            prescriptions = cursor.fetchall()
 
-        # Parse vital signs JSON
-        vital_signs = {}
-        if visit[10]:  # vital_signs column
+        # Parse vital signs JSON (stored as text by create_visit)
+        vital_signs = visit.vital_signs or {}
+        if isinstance(vital_signs, str):
             try:
-                vital_signs = json.loads(visit[10])
+                vital_signs = json.loads(vital_signs)
             except:
                 vital_signs = {}
-
-        visit_data = {
-            "id": visit[0],
-            "patient_id": visit[1],
-            "doctor_id": visit[2],
-            "clinic_id": visit[3],
-            "visit_date": visit[4],
-            "visit_type": visit[5],
-            "chief_complaint": visit[6],
-            "diagnosis": visit[7],
-            "treatment": visit[8],
-            "notes": visit[9],
-            "vital_signs": vital_signs,
-            "status": visit[11],
-            "follow_up_date": visit[12],
-            "created_at": visit[13],
-            "updated_at": visit[14],
-            "patient_name": visit[15],
-            "patient_code": visit[16],
-            "doctor_name": visit[17],
-            "clinic_name": visit[18]
-        }
-
-        prescription_list = []
-        for p in prescriptions:
-            prescription_list.append({
-                "id": p[0],
-                "medicine_name": p[1],
-                "dosage": p[2],
-                "frequency": p[3],
-                "duration": p[4],
-                "instructions": p[5],
-                "quantity": p[6],
-                "status": p[7]
-            })
+        visit = visit._replace(vital_signs=vital_signs)
 
         return templates.TemplateResponse(
             "visit_detail.html",
             {
                 "request": request, 
                 "user": user, 
-                "visit": visit_data,
-                "prescriptions": prescription_list
+                "visit": visit,
+                "prescriptions": prescriptions
             }
         )
     except Exception as e:
         logger.error(f"Visit detail error: {e}")
-        if conn:
-            conn.close()
         return HTMLResponse(content=f"<h1>Error: {e}</h1>", status_code=500)
\ No newline at end of file
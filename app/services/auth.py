@@ -1,73 +1,43 @@
-from app.db.context import get_db_cursor
-from datetime import datetime
+from app.db.async_context import get_async_cursor
+from app.services.login_audit import login_audit
+from app.services.passwords import verify_password_async, hash_password_async, DUMMY_HASH
+from app.services.user_context import context_from_row, USER_COLUMNS
 import logging
 
 logger = logging.getLogger(__name__)
 
-def authenticate_user(username: str, password: str):
-    with get_db_cursor() as cur:
-        query = """
-            SELECT u.id, u.username, u.full_name, u.email, u.phone, u.role, u.clinic_id, c.name as clinic_name
+async def authenticate_user(username: str, password: str):
+    async with get_async_cursor() as cur:
+        await cur.execute(f"""
+            SELECT {USER_COLUMNS}, u.password
             FROM users u
-            LEFT JOIN clinics c ON u.clinic_id = c.id
-            WHERE u.username = %s AND u.password = %s AND u.is_active = TRUE
-        """
-        cur.execute(query, (username, password))
-        result = cur.fetchone()
-        if result:
-            user_data = {
-                "id": result[0],
-                "username": result[1],
-                "full_name": result[2],
-                "email": result[3],
-                "phone": result[4],
-                "role": result[5],
-                "clinic_id": result[6],
-                "clinic_name": result[7] if result[7] else "All Clinics",
-                "has_emoc": result[5] in ['admin', 'manager', 'emoc_staff']
-            }
-            return user_data
+            WHERE u.username = %s AND u.is_active = TRUE
+        """, (username,))
+        result = await cur.fetchone()
+
+    # Hashing runs on the password pool, never on the event loop
+    stored = result.password if result else DUMMY_HASH
+    matches, needs_rehash = await verify_password_async(password, stored)
+    if not result or not matches:
         return None
 
+    if needs_rehash:
+        try:
+            new_hash = await hash_password_async(password)
+            async with get_async_cursor() as cur:
+                # Only if nobody changed the password meanwhile
+                await cur.execute("UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                                  (new_hash, result.id, stored))
+        except Exception as e:
+            logger.error(f"Password rehash failed for {username}: {e}")
+
+    # Stored as JSON in the server-side session, so hand back a plain dict
+    return await context_from_row(result)
+
 def log_login_attempt(username, ip_address, location_data, success, user_agent=None):
-    with get_db_cursor() as cur:
-        cur.execute("""
-            INSERT INTO login_logs (username, ip_address, country, region, city, latitude, longitude, isp, success, user_agent)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            username,
-            ip_address,
-            location_data.get("country") if location_data else None,
-            location_data.get("region") if location_data else None,
-            location_data.get("city") if location_data else None,
-            location_data.get("lat") if location_data else None,
-            location_data.get("lon") if location_data else None,
-            location_data.get("isp") if location_data else None,
-            success,
-            user_agent
-        ))
+    # Queued; written to login_logs in batches by app/services/login_audit.py
+    login_audit.record_attempt(username, ip_address, location_data, success, user_agent)
 
 def update_user_last_login(username, ip_address, location_data):
-    with get_db_cursor() as cur:
-        cur.execute("""
-            UPDATE users
-            SET last_login_at = %s,
-                last_login_ip = %s,
-                last_login_country = %s,
-                last_login_region = %s,
-                last_login_city = %s,
-                last_login_lat = %s,
-                last_login_lon = %s,
-                last_login_isp = %s
-            WHERE username = %s
-        """, (
-            datetime.now(),
-            ip_address,
-            location_data.get("country") if location_data else None,
-            location_data.get("region") if location_data else None,
-            location_data.get("city") if location_data else None,
-            location_data.get("lat") if location_data else None,
-            location_data.get("lon") if location_data else None,
-            location_data.get("isp") if location_data else None,
-            username
-        ))
\ No newline at end of file
+    # Coalesced per user and applied with the next audit flush
+    login_audit.record_last_login(username, ip_address, location_data)
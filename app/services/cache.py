@@ -0,0 +1,204 @@
+"""Result cache for expensive service calls.
+
+    @cached("dashboard_stats", ttl=30, stale_ttl=300)
+    def get_dashboard_stats():
+        ...
+
+Within ``ttl`` seconds of being computed a result is served from memory.
+For a further ``stale_ttl`` seconds the old result is still served at once
+while one background refresh recomputes it (stale-while-revalidate). Past
+that, callers wait; concurrent misses for the same key share a single
+computation instead of each running it (single-flight). Works on plain and
+``async def`` functions; keys are the call arguments.
+
+Per-key counters (hits, stale, misses, coalesced, refreshes, errors) are
+available from ``cache_stats()``.
+"""
+from collections import Counter
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+caches = {}
+
+class _Flight:
+    """One in-progress computation that other callers can wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.future = None         # asyncio.Future for async functions
+        self.value = None
+        self.error = None
+
+class ServiceCache:
+    def __init__(self, name, ttl, stale_ttl=0, maxsize=1024):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = {}         # key -> (value, fresh_until, stale_until)
+        self._flights = {}         # key -> _Flight
+        self._metrics = {}         # key -> Counter
+
+    def _count(self, key, metric):
+        self._metrics.setdefault(key, Counter())[metric] += 1
+
+    def _store(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, now + self.ttl, now + self.ttl + self.stale_ttl)
+            while len(self._entries) > self.maxsize:
+                self._entries.pop(next(iter(self._entries)))
+
+    def _lookup(self, key):
+        """Return (state, value, flight) and register a flight when one is needed.
+
+        state is "hit", "stale" (serve value; refresh if flight is new),
+        "wait" (join flight) or "lead" (compute, then finish flight).
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now < entry[1]:
+                self._count(key, "hits")
+                return "hit", entry[0], None
+            flight = self._flights.get(key)
+            if entry and now < entry[2]:
+                self._count(key, "stale")
+                if flight:
+                    return "hit", entry[0], None
+                self._count(key, "refreshes")
+                flight = self._flights[key] = _Flight()
+                return "stale", entry[0], flight
+            self._count(key, "misses")
+            if flight:
+                self._count(key, "coalesced")
+                return "wait", None, flight
+            flight = self._flights[key] = _Flight()
+            return "lead", None, flight
+
+    def _finish(self, key, flight, value=None, error=None):
+        if error is None:
+            self._store(key, value)
+        else:
+            with self._lock:
+                self._count(key, "errors")
+        flight.value, flight.error = value, error
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.done.set()
+
+    def _compute(self, key, flight, func, args, kwargs):
+        try:
+            value = func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, value)
+        return value
+
+    def _refresh(self, key, flight, func, args, kwargs):
+        try:
+            self._compute(key, flight, func, args, kwargs)
+        except Exception as e:
+            logger.error(f"Background refresh of {self.name}{key[0]} failed: {e}")
+
+    def call(self, func, args, kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        state, value, flight = self._lookup(key)
+        if state == "hit":
+            return value
+        if state == "stale":
+            threading.Thread(target=self._refresh, args=(key, flight, func, args, kwargs),
+                             name=f"cache-refresh-{self.name}", daemon=True).start()
+            return value
+        if state == "wait":
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        return self._compute(key, flight, func, args, kwargs)
+
+    async def _compute_async(self, key, flight, func, args, kwargs):
+        flight.future = asyncio.get_running_loop().create_future()
+        try:
+            value = await func(*args, **kwargs)
+        except BaseException as e:
+            # Always finish the flight, even when cancelled, or later callers would wait forever
+            if isinstance(e, asyncio.CancelledError):
+                flight.future.cancel()
+            else:
+                flight.future.set_exception(e)
+                flight.future.exception()   # waiters re-raise it; don't warn when there are none
+            self._finish(key, flight, error=e)
+            raise
+        flight.future.set_result(value)
+        self._finish(key, flight, value)
+        return value
+
+    async def _refresh_async(self, key, flight, func, args, kwargs):
+        try:
+            await self._compute_async(key, flight, func, args, kwargs)
+        except Exception as e:
+            logger.error(f"Background refresh of {self.name}{key[0]} failed: {e}")
+
+    async def call_async(self, func, args, kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        state, value, flight = self._lookup(key)
+        if state == "hit":
+            return value
+        if state == "stale":
+            asyncio.create_task(self._refresh_async(key, flight, func, args, kwargs))
+            return value
+        if state == "wait":
+            # The leader creates the future as soon as it starts running
+            while flight.future is None and not flight.done.is_set():
+                await asyncio.sleep(0)
+            if flight.future is not None:
+                return await asyncio.shield(flight.future)
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        return await self._compute_async(key, flight, func, args, kwargs)
+
+    def invalidate(self, *args, **kwargs):
+        """Drop one key, or every key when called without arguments"""
+        with self._lock:
+            if args or kwargs:
+                self._entries.pop((args, tuple(sorted(kwargs.items()))), None)
+            else:
+                self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "keys": {f"{self.name}{args}": dict(counts)
+                         for (args, _), counts in self._metrics.items()},
+            }
+
+def cached(name, ttl, stale_ttl=0, maxsize=1024):
+    """Cache a service function's results; see the module docstring"""
+    def decorator(func):
+        cache = caches[name] = ServiceCache(name, ttl, stale_ttl, maxsize)
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await cache.call_async(func, args, kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return cache.call(func, args, kwargs)
+        wrapper.cache = cache
+        wrapper.invalidate = cache.invalidate
+        return wrapper
+    return decorator
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in caches.items()}
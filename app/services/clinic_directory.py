@@ -0,0 +1,89 @@
+"""In-memory clinic directory.
+
+The clinic list changes a few times a year but is read on every patient
+form and every login, so it is loaded once and served from memory until
+CLINIC_CACHE_TTL_SEC passes or ``invalidate()`` is called.
+
+Sync routes use ``all()`` / ``name()``, which reload under a lock. Code on
+the event loop (login, the user context cache) uses ``name_async()``: a
+fresh directory is read from memory without the lock, and a stale one is
+reloaded on the threadpool, so the loop never waits on psycopg2.
+
+Clinics are not edited anywhere in the app, so nothing invalidates the
+directory automatically: after adding or renaming a clinic (SQL, scripts),
+call POST /admin/clinics/refresh on each worker or wait out the TTL.
+"""
+from app.db.context import get_db_cursor
+from app.core.config import get_settings
+from starlette.concurrency import run_in_threadpool
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class ClinicDirectory:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._clinics = []         # (id, name) rows ordered by name
+        self._names = {}           # id -> name
+        self._loaded_at = None
+
+    def _fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def _load(self):
+        with get_db_cursor() as cur:
+            cur.execute("SELECT id, name FROM clinics ORDER BY name")
+            clinics = cur.fetchall()
+        self._clinics = clinics
+        self._names = {c.id: c.name for c in clinics}
+        self._loaded_at = time.monotonic()
+        logger.info(f"Clinic directory loaded: {len(clinics)} clinics")
+
+    def _current(self):
+        # One thread reloads while the rest wait, instead of all of them querying
+        with self._lock:
+            if self._fresh():
+                self.hits += 1
+            else:
+                self.misses += 1
+                try:
+                    self._load()
+                except Exception as e:
+                    # Keep serving the last good list rather than failing forms and logins
+                    logger.error(f"Failed to load clinic directory: {e}")
+            return self._clinics
+
+    def all(self):
+        """(id, name) rows for every clinic, ordered by name"""
+        return self._current()
+
+    def name(self, clinic_id, default=None):
+        self._current()
+        return self._names.get(clinic_id, default)
+
+    async def name_async(self, clinic_id, default=None):
+        """name() for async code"""
+        if self._fresh():
+            self.hits += 1
+        else:
+            await run_in_threadpool(self._current)
+        return self._names.get(clinic_id, default)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def stats(self):
+        return {
+            "clinics": len(self._clinics),
+            "hits": self.hits,
+            "misses": self.misses,
+            "age_sec": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None,
+        }
+
+clinic_directory = ClinicDirectory(ttl=get_settings().CLINIC_CACHE_TTL_SEC)
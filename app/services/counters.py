@@ -0,0 +1,51 @@
+"""Dashboard statistics from the ``daily_counts`` summary table.
+
+``daily_counts`` holds one row per clinic per day (clinic 0 collects rows
+with no clinic) and is kept current by row triggers on patients, visits,
+bills and login_logs; see migrate_database.py. Dashboards sum a handful of
+those rows instead of scanning the source tables, so their cost depends on
+the number of clinics and days, not on the number of patients or visits.
+
+``reconcile_counters()`` rebuilds the table (or the days since a given date)
+from the source tables. Run it nightly with reconcile_counters.py; it
+corrects the rare double count of a visiting patient when two visits for
+the same patient are recorded concurrently.
+"""
+from app.db.context import get_db_cursor
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = {"patients_registered", "visits", "visiting_patients", "revenue_paid",
+           "revenue_pending", "login_attempts", "login_failures"}
+
+PERIODS = {
+    "all": "",
+    "today": "day = CURRENT_DATE",
+    "month": "day >= date_trunc('month', CURRENT_DATE)::date",
+}
+
+def counter_sql(column, period="all", clinic_id=None):
+    """(sql, params) summing one ``daily_counts`` column over ``period``"""
+    if column not in COLUMNS:
+        raise ValueError(f"unknown counter: {column}")
+    clauses, params = [], []
+    if PERIODS[period]:
+        clauses.append(PERIODS[period])
+    if clinic_id is not None:
+        clauses.append("clinic_id = %s")
+        params.append(clinic_id)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return f"SELECT COALESCE(SUM({column}), 0) FROM daily_counts {where}", tuple(params)
+
+def read_counter(cur, column, period="all", clinic_id=None):
+    cur.execute(*counter_sql(column, period, clinic_id))
+    return cur.fetchone()[0]
+
+def reconcile_counters(since=None):
+    """Rebuild daily_counts from source (days on/after ``since`` if given)"""
+    with get_db_cursor() as cur:
+        cur.execute("SELECT reconcile_daily_counts(%s)", (since,))
+        rows = cur.fetchone()[0]
+    logger.info(f"Daily counters reconciled: {rows} clinic-days" + (f" since {since}" if since else ""))
+    return rows
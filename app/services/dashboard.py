@@ -1,17 +1,84 @@
 from app.db.context import get_db_cursor
+from app.services.table_counts import read_count
+from app.services.counters import read_counter
+from app.services.cache import cached
+from app.core.config import get_settings
 import logging
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
-def get_dashboard_stats():
-    total_patients = 0
-    total_login_logs = 0
+# Shown when the stats can't be read at all (nothing cached yet)
+EMPTY_STATS = {
+    "total_patients": 0,
+    "total_login_logs": 0,
+    "counts_approximate": False,
+    "today_visits": 0,
+    "monthly_revenue": 0,
+}
+
+def read_dashboard_stats(exact=False):
+    """Headline numbers for /dashboard; counts may be estimates, see table_counts.py.
+
+    Errors propagate, so the cache below keeps serving the last good result
+    instead of storing zeros.
+    """
+    stats = dict(EMPTY_STATS)
+    with get_db_cursor() as cur:
+        stats["total_patients"], stats["counts_approximate"] = read_count(cur, "patients", exact)
+        stats["total_login_logs"], _ = read_count(cur, "login_logs", exact)
+        stats["today_visits"] = read_counter(cur, "visits", "today")
+        stats["monthly_revenue"] = read_counter(cur, "revenue_paid", "month")
+    return stats
+
+@cached("dashboard_stats", ttl=settings.DASHBOARD_CACHE_TTL_SEC,
+        stale_ttl=settings.DASHBOARD_CACHE_STALE_SEC)
+def _cached_dashboard_stats():
+    return read_dashboard_stats(exact=False)
+
+def get_dashboard_stats(exact=False):
+    """Cached stats; ``exact`` asks for fresh exact counts, so it bypasses the cache"""
+    if exact:
+        return read_dashboard_stats(exact=True)
+    return _cached_dashboard_stats()
+
+# One pass over daily_counts grouped by clinic, plus active users per clinic
+CLINIC_BREAKDOWN_SQL = """
+    SELECT c.id AS clinic_id, c.name AS clinic_name,
+           COALESCE(d.patients, 0) AS patients,
+           COALESCE(d.today_visits, 0) AS today_visits,
+           COALESCE(d.month_revenue, 0) AS month_revenue,
+           COALESCE(u.active_users, 0) AS active_users
+    FROM clinics c
+    LEFT JOIN (
+        SELECT clinic_id,
+               SUM(patients_registered) AS patients,
+               SUM(visits) FILTER (WHERE day = CURRENT_DATE) AS today_visits,
+               SUM(revenue_paid) FILTER (WHERE day >= date_trunc('month', CURRENT_DATE)) AS month_revenue
+        FROM daily_counts
+        WHERE %(clinic_id)s::int IS NULL OR clinic_id = %(clinic_id)s::int
+        GROUP BY clinic_id
+    ) d ON d.clinic_id = c.id
+    LEFT JOIN (
+        SELECT clinic_id, COUNT(*) AS active_users
+        FROM users
+        WHERE is_active = TRUE
+          AND (%(clinic_id)s::int IS NULL OR clinic_id = %(clinic_id)s::int)
+        GROUP BY clinic_id
+    ) u ON u.clinic_id = c.id
+    WHERE %(clinic_id)s::int IS NULL OR c.id = %(clinic_id)s::int
+    ORDER BY c.name
+"""
+
+@cached("clinic_breakdown", ttl=settings.DASHBOARD_CACHE_TTL_SEC,
+        stale_ttl=settings.DASHBOARD_CACHE_STALE_SEC)
+def get_clinic_breakdown(clinic_id=None):
+    """Per-clinic patients, today's visits, month revenue and active users.
+
+    ``clinic_id`` limits the result to one clinic; None (admins and other
+    all-clinic users) returns every clinic.
+    """
+    # Errors propagate so a failed read is never cached as "no clinics"
     with get_db_cursor() as cur:
-        try:
-            cur.execute("SELECT COUNT(*) FROM patients")
-            total_patients = cur.fetchone()[0]
-            cur.execute("SELECT COUNT(*) FROM login_logs")
-            total_login_logs = cur.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error fetching dashboard stats: {e}")
-    return total_patients, total_login_logs
\ No newline at end of file
+        cur.execute(CLINIC_BREAKDOWN_SQL, {"clinic_id": clinic_id})
+        return cur.fetchall()
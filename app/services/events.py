@@ -0,0 +1,114 @@
+"""In-process event bus behind the dashboard's Server-Sent Events stream.
+
+Write paths call ``event_bus.publish(kind, data, clinic_id)`` once per
+change and every connected dashboard of that clinic receives the same
+event, so N open dashboards cost one publish instead of N polls of the
+stats queries. ``publish`` is safe to call from sync routes running in the
+threadpool.
+
+Each subscription carries the clinic it may see (None = all clinics, for
+admins), and events of other clinics never reach it. The dashboard's
+headline cards count every clinic, though, so an event may also carry
+``counts`` (e.g. ``{"patients": 1}``): subscribers of other clinics get
+just those as a ``counts`` event with the same id. Payloads are ids and
+counts only, never names or other patient details.
+
+Recent events are kept in a short ring buffer so a reconnecting browser
+(EventSource sends Last-Event-ID) gets what it missed. A subscriber that
+stops reading has its oldest queued events dropped rather than holding
+memory. Events only reach dashboards served by this process; with several
+workers each one sees its own writes.
+"""
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+import asyncio
+import itertools
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+class EventBus:
+    def __init__(self, history=200, queue_size=100):
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self._subscribers = {}     # queue -> clinic_id (None = all clinics)
+        self._loop = None
+
+    def start(self):
+        """Bind to the running event loop (called at startup)"""
+        self._loop = asyncio.get_running_loop()
+
+    def publish(self, kind, data, clinic_id=None, counts=None):
+        """Send ``data`` to subscribers of ``clinic_id`` (None = all-clinic
+        subscribers only), and ``counts`` to everyone else"""
+        if self._loop is None:
+            return
+        event = (next(self._ids), kind, json.dumps(data, default=_json_default), clinic_id,
+                 json.dumps(counts) if counts else None)
+        self._loop.call_soon_threadsafe(self._fanout, event)
+
+    @staticmethod
+    def _view(event, clinic_id):
+        """What a subscriber of ``clinic_id`` gets for ``event``, if anything"""
+        event_id, _kind, _data, event_clinic, counts = event
+        if clinic_id is None or event_clinic == clinic_id:
+            return event
+        if counts is not None:
+            return (event_id, "counts", counts, event_clinic, None)
+        return None
+
+    def _fanout(self, event):
+        self.published += 1
+        self._history.append(event)
+        for queue, clinic_id in self._subscribers.items():
+            view = self._view(event, clinic_id)
+            if view is None:
+                continue
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(view)
+
+    async def subscribe(self, clinic_id=None, last_event_id=None, heartbeat=15.0):
+        """Yield ``clinic_id``'s events as they are published (None = every
+        clinic) and other clinics' counts; None every ``heartbeat`` idle seconds"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if last_event_id is not None:
+            for event in self._history:
+                view = self._view(event, clinic_id) if event[0] > last_event_id else None
+                if view is not None and not queue.full():
+                    queue.put_nowait(view)
+        self._subscribers[queue] = clinic_id
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._subscribers.pop(queue, None)
+
+    def stats(self):
+        return {"subscribers": len(self._subscribers), "published": self.published,
+                "dropped": self.dropped}
+
+event_bus = EventBus()
+
+def format_sse(event):
+    """Wire format for one event, or a comment line for a heartbeat"""
+    if event is None:
+        return ": keep-alive\n\n"
+    event_id, kind, data = event[:3]
+    return f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n"
@@ -0,0 +1,115 @@
+"""Streaming CSV/NDJSON extracts for /patients/export and /visits/export.
+
+Rows come from a named (server-side) cursor ``itersize`` at a time and are
+encoded into ~64 KiB chunks as the client reads them, optionally through a
+streaming gzip compressor, so memory stays flat however large the table.
+The generators are synchronous; StreamingResponse runs them in the
+threadpool, which is where the blocking psycopg2 calls belong anyway.
+"""
+from app.db.context import get_db_cursor
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime
+from decimal import Decimal
+import csv
+import io
+import json
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+ITERSIZE = 5000
+CHUNK_BYTES = 64 * 1024
+
+FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+def export_filter(column, clinic_id=None, date_from=None, date_to=None, clinic_column="clinic_id"):
+    """WHERE clause and params for the clinic/date-range filters.
+
+    ``date_to`` is inclusive, so the bound is the start of the next day.
+    """
+    clauses, params = [], []
+    if clinic_id is not None:
+        clauses.append(f"{clinic_column} = %s")
+        params.append(clinic_id)
+    if date_from:
+        clauses.append(f"{column} >= %s")
+        params.append(date_from)
+    if date_to:
+        clauses.append(f"{column} < %s::date + 1")
+        params.append(date_to)
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def stream_rows(name, sql, params=(), itersize=ITERSIZE):
+    """Yield rows of ``sql`` from a server-side cursor"""
+    with get_db_cursor() as cur:
+        with cur.connection.cursor(name=name) as stream:
+            stream.itersize = itersize
+            stream.execute(sql, params)
+            yield from stream
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+def csv_lines(columns, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= CHUNK_BYTES:
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode()
+
+def ndjson_lines(columns, rows):
+    parts, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), default=_json_default) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(parts).encode()
+            parts, size = [], 0
+    yield "".join(parts).encode()
+
+ENCODERS = {"csv": csv_lines, "ndjson": ndjson_lines}
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _logged(chunks, label):
+    # Headers are already sent once streaming starts, so all we can do is log
+    try:
+        yield from chunks
+    except Exception as e:
+        logger.error(f"{label} export failed mid-stream: {e}")
+        raise
+
+def export_response(label, sql, params, columns, fmt="csv", gzip=False):
+    """StreamingResponse for an export; raises ValueError on an unknown format"""
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported export format: {fmt!r}")
+
+    chunks = ENCODERS[fmt](columns, stream_rows(f"{label}_export", sql, params))
+    filename = f"{label}_{datetime.now():%Y%m%d_%H%M%S}.{fmt}"
+    media_type = FORMATS[fmt]
+    if gzip:
+        chunks = gzipped(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        _logged(chunks, label),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
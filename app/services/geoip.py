@@ -0,0 +1,178 @@
+"""Offline IP geolocation for login auditing.
+
+Reads an IP-range CSV (optionally gzipped) with the header
+
+    start_ip,end_ip,country,region,city,lat,lon,isp
+
+IPv4 ranges go into three parallel ``array("I")`` columns (start, end,
+location index), about 12 bytes a range; repeated locations are stored
+once. IPv6 ranges, usually far fewer, are kept in plain lists. A lookup is
+one bisect; recent answers are kept in an LRU.
+
+The file is loaded in a background thread at startup and reloaded the same
+way when its mtime changes (checked at most every GEOIP_RELOAD_CHECK_SEC)
+or on POST /admin/geoip/reload. Until a database is loaded ``locate()``
+returns None, so a login never waits on the file or on the network.
+"""
+from app.core.config import get_settings
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+import csv
+import gzip
+import ipaddress
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("country", "region", "city", "lat", "lon", "isp")
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class GeoIPDatabase:
+    """Immutable range table; build a new one to reload"""
+    def __init__(self, rows, cache_size=10000):
+        locations, location_ids = [], {}
+        v4, v6 = [], []
+        for start, end, location in rows:
+            index = location_ids.get(location)
+            if index is None:
+                index = location_ids[location] = len(locations)
+                locations.append(location)
+            (v4 if start.version == 4 else v6).append((int(start), int(end), index))
+        v4.sort()
+        v6.sort()
+
+        self.locations = locations
+        self.v4_starts = array("I", (r[0] for r in v4))
+        self.v4_ends = array("I", (r[1] for r in v4))
+        self.v4_locs = array("I", (r[2] for r in v4))
+        self.v6_starts = [r[0] for r in v6]
+        self.v6_ends = [r[1] for r in v6]
+        self.v6_locs = [r[2] for r in v6]
+        self.ranges = len(v4) + len(v6)
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def load(cls, path, cache_size=10000):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", newline="") as f:
+            return cls(cls._parse(csv.DictReader(f)), cache_size)
+
+    @staticmethod
+    def _parse(reader):
+        for line_no, row in enumerate(reader, 2):
+            try:
+                start = ipaddress.ip_address(row["start_ip"].strip())
+                end = ipaddress.ip_address(row["end_ip"].strip())
+            except (KeyError, ValueError, AttributeError):
+                logger.warning(f"GeoIP: skipping bad range on line {line_no}")
+                continue
+            if start.version != end.version or start > end:
+                logger.warning(f"GeoIP: skipping bad range on line {line_no}")
+                continue
+            yield start, end, (
+                row.get("country") or None,
+                row.get("region") or None,
+                row.get("city") or None,
+                _float(row.get("lat")),
+                _float(row.get("lon")),
+                row.get("isp") or None,
+            )
+
+    def _lookup(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if address.version == 4:
+            starts, ends, locs = self.v4_starts, self.v4_ends, self.v4_locs
+        else:
+            starts, ends, locs = self.v6_starts, self.v6_ends, self.v6_locs
+        value = int(address)
+        i = bisect_right(starts, value) - 1
+        if i < 0 or value > ends[i]:
+            return None
+        return dict(zip(FIELDS, self.locations[locs[i]]))
+
+class GeoIPResolver:
+    def __init__(self, path, cache_size=10000, check_every=60.0):
+        self.path = path
+        self.cache_size = cache_size
+        self.check_every = check_every
+        self._db = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._loading = threading.Lock()
+
+    def locate(self, ip):
+        """Location dict for ``ip``, or None (unknown, or no database loaded)"""
+        self._maybe_reload()
+        db = self._db
+        if db is None or not ip:
+            return None
+        location = db.lookup(ip)
+        # Callers get their own copy; the cached dict is shared
+        return dict(location) if location else None
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_every:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload_in_background()
+
+    def reload(self):
+        """Load the database file and swap it in; returns the range count"""
+        if not self._loading.acquire(blocking=False):
+            return None  # a reload is already running
+        try:
+            mtime = os.stat(self.path).st_mtime
+            started = time.perf_counter()
+            db = GeoIPDatabase.load(self.path, self.cache_size)
+            self._db, self._mtime = db, mtime
+            logger.info(f"GeoIP database loaded: {db.ranges} ranges, {len(db.locations)} locations "
+                        f"in {time.perf_counter() - started:.1f}s")
+            return db.ranges
+        except Exception as e:
+            logger.error(f"Failed to load GeoIP database {self.path}: {e}")
+            return None
+        finally:
+            self._loading.release()
+
+    def reload_in_background(self):
+        threading.Thread(target=self.reload, name="geoip-reload", daemon=True).start()
+
+    def stats(self):
+        db = self._db
+        if db is None:
+            return {"loaded": False, "path": self.path}
+        info = db.lookup.cache_info()
+        return {"loaded": True, "path": self.path, "ranges": db.ranges,
+                "cache_hits": info.hits, "cache_misses": info.misses, "cache_size": info.currsize}
+
+settings = get_settings()
+
+geoip = GeoIPResolver(
+    settings.GEOIP_DB_PATH,
+    cache_size=settings.GEOIP_CACHE_SIZE,
+    check_every=settings.GEOIP_RELOAD_CHECK_SEC,
+)
+
+def start_geoip():
+    geoip._checked_at = time.monotonic()
+    geoip.reload_in_background()
@@ -0,0 +1,191 @@
+"""Write-behind login auditing.
+
+``log_login_attempt`` and ``update_user_last_login`` used to run two
+transactions on every login. They now hand the event to this writer and
+return. A background thread flushes queued attempts to login_logs with
+one multi-row INSERT per batch, and applies the ``users.last_login_*``
+updates with one UPDATE ... FROM (VALUES ...) in the same transaction.
+Last-login updates are coalesced per user, so a burst of logins for one
+account writes that row once per flush.
+
+The attempt queue is bounded: when the database cannot keep up (e.g. a
+credential-stuffing burst) new attempts are dropped and counted rather
+than growing memory or slowing logins. The queue is drained on shutdown.
+
+A batch whose transaction fails is not thrown away: its attempts go back
+on the queue and its last-login updates back into the pending set (newer
+logins for the same user win), and the writer backs off, doubling the wait
+up to ``max_backoff`` seconds, until a flush succeeds. Attempts are only
+lost when the queue has no room left for them; those are counted in
+``failed`` (see /db-test).
+"""
+from app.db.context import get_db_cursor
+from app.core.config import get_settings
+from psycopg2.extras import execute_values
+from datetime import datetime
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def _location_fields(location):
+    location = location or {}
+    return (location.get("country"), location.get("region"), location.get("city"),
+            location.get("lat"), location.get("lon"), location.get("isp"))
+
+class LoginAuditWriter:
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=1.0, max_backoff=30.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self._backoff = 0.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_logins = {}     # username -> newest (time, ip, location fields)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.last_flush_ms = None
+
+    def record_attempt(self, username, ip_address, location, success, user_agent=None):
+        event = (username, datetime.now(), ip_address, *_location_fields(location), success, user_agent)
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def record_last_login(self, username, ip_address, location):
+        with self._lock:
+            self._last_logins[username] = (datetime.now(), ip_address, *_location_fields(location))
+
+    def _take_batch(self, wait):
+        events = []
+        try:
+            events.append(self._queue.get(timeout=wait) if wait else self._queue.get_nowait())
+            while len(events) < self.batch_size:
+                events.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return events
+
+    def _write(self, events, last_logins):
+        started = time.perf_counter()
+        try:
+            with get_db_cursor() as cur:
+                if events:
+                    execute_values(cur, """
+                        INSERT INTO login_logs (username, login_time, ip_address, country, region, city,
+                                                latitude, longitude, isp, success, user_agent)
+                        VALUES %s
+                    """, events, page_size=self.batch_size)
+                if last_logins:
+                    execute_values(cur, """
+                        UPDATE users u
+                        SET last_login_at = v.at,
+                            last_login_ip = v.ip,
+                            last_login_country = v.country,
+                            last_login_region = v.region,
+                            last_login_city = v.city,
+                            last_login_lat = v.lat,
+                            last_login_lon = v.lon,
+                            last_login_isp = v.isp
+                        FROM (VALUES %s) AS v (username, at, ip, country, region, city, lat, lon, isp)
+                        WHERE u.username = v.username
+                    """, [(username, *fields) for username, fields in last_logins.items()],
+                        template="(%s, %s::timestamp, %s, %s, %s, %s, %s::numeric, %s::numeric, %s)",
+                        page_size=self.batch_size)
+        except Exception as e:
+            lost = self._requeue(events, last_logins)
+            self._backoff = min(self.max_backoff, self._backoff * 2 or self.flush_interval)
+            logger.error(f"Login audit flush failed, retrying in {self._backoff:.0f}s "
+                         f"({len(events) - lost} attempts requeued, {lost} lost): {e}")
+            return False
+        self._backoff = 0.0
+        with self._lock:
+            self.written += len(events)
+            self.batches += 1
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+        return True
+
+    def _requeue(self, events, last_logins):
+        """Put a failed batch back; returns how many attempts did not fit"""
+        lost = 0
+        for event in events:
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                lost += 1
+        with self._lock:
+            for username, fields in last_logins.items():
+                self._last_logins.setdefault(username, fields)
+            self.failed += lost
+            self.retries += 1
+        return lost
+
+    def flush(self, wait=0):
+        """Write one batch of queued attempts plus all pending last-login updates.
+
+        Returns the number of attempts written (0 if the batch was requeued).
+        """
+        events = self._take_batch(wait)
+        with self._lock:
+            last_logins, self._last_logins = self._last_logins, {}
+        if (events or last_logins) and not self._write(events, last_logins):
+            return 0
+        return len(events)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._backoff:
+                self._stop.wait(self._backoff)
+            self.flush(wait=self.flush_interval)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="login-audit", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread and write out everything still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        while self.flush():
+            pass
+        if self._backoff:
+            with self._lock:
+                lost = self._queue.qsize()
+                self.failed += lost
+            logger.error(f"Login audit stopped with the database unavailable, {lost} attempts lost")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "pending_last_logins": len(self._last_logins),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "retries": self.retries,
+                "backoff_sec": self._backoff,
+                "batches": self.batches,
+                "last_flush_ms": self.last_flush_ms,
+            }
+
+settings = get_settings()
+
+login_audit = LoginAuditWriter(
+    max_queue=settings.LOGIN_AUDIT_QUEUE_SIZE,
+    batch_size=settings.LOGIN_AUDIT_BATCH_SIZE,
+    flush_interval=settings.LOGIN_AUDIT_FLUSH_SEC,
+)
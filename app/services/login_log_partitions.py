@@ -0,0 +1,125 @@
+"""Partition upkeep for login_logs.
+
+login_logs is range-partitioned by month on login_time (one table per
+month, ``login_logs_YYYY_MM``, each with its own login_time index; see
+migrate_database.py). There is no default partition, so a month must exist
+before its first insert: ``ensure_partitions`` creates the next
+LOGIN_LOG_PARTITIONS_AHEAD months and runs at startup and from
+archive_login_logs.py.
+
+``apply_retention`` archives months older than LOGIN_LOG_RETENTION_MONTHS:
+detach the partition, COPY it to ``<archive dir>/login_logs_YYYY_MM.csv.gz``
+and drop it. The detach is ``DETACH PARTITION ... CONCURRENTLY`` (PostgreSQL
+14+), which only takes a SHARE UPDATE EXCLUSIVE lock on login_logs, so
+logins keep being written meanwhile; it cannot run inside a transaction
+block, so it gets an autocommit connection. Each step commits, and a
+partition left detached, or half-detached (pending) by an interrupted run,
+is picked up by the next one with ``DETACH PARTITION ... FINALIZE``, so
+nothing is dropped before its archive file is complete.
+"""
+from app.db.context import get_db_cursor
+from app.db.pools import pool
+from app.core.config import get_settings
+from datetime import date
+import gzip
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+PARTITIONS_SQL = """
+    SELECT c.relname AS name, i.inhparent IS NOT NULL AS attached,
+           COALESCE(i.inhdetachpending, FALSE) AS detach_pending
+    FROM pg_class c
+    LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+    WHERE c.relkind = 'r' AND c.relname ~ '^login_logs_[0-9]{4}_[0-9]{2}$'
+    ORDER BY c.relname
+"""
+
+def partition_month(name):
+    year, month = name.rsplit("_", 2)[1:]
+    return date(int(year), int(month), 1)
+
+def ensure_partitions(months_ahead=None):
+    """Create this month's partition and the next few; returns how many were new"""
+    if months_ahead is None:
+        months_ahead = settings.LOGIN_LOG_PARTITIONS_AHEAD
+    with get_db_cursor() as cur:
+        cur.execute("SELECT ensure_login_log_partitions(now()::date, %s)", (months_ahead,))
+        created = cur.fetchone()[0]
+    if created:
+        logger.info(f"Created {created} login_logs partitions")
+    return created
+
+def list_partitions():
+    with get_db_cursor() as cur:
+        cur.execute(PARTITIONS_SQL)
+        return [(row.name, partition_month(row.name), row.attached, row.detach_pending)
+                for row in cur.fetchall()]
+
+def _detach(name, pending):
+    """Detach one partition outside a transaction block (CONCURRENTLY and
+    FINALIZE both refuse to run inside one)"""
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE login_logs DETACH PARTITION {name} "
+                        f"{'FINALIZE' if pending else 'CONCURRENTLY'}")
+    finally:
+        if not conn.closed:
+            conn.autocommit = False
+        pool.putconn(conn)
+
+def _archive(name, archive_dir):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial = path + ".partial"
+    with get_db_cursor() as cur:
+        with gzip.open(partial, "wt", encoding="utf-8", newline="") as f:
+            cur.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+        with open(partial, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(partial, path)
+        cur.execute(f"SELECT COUNT(*) FROM {name}")
+        rows = cur.fetchone()[0]
+        cur.execute(f"DROP TABLE {name}")
+    return path, rows
+
+def apply_retention(keep_months=None, archive_dir=None, dry_run=False):
+    """Archive and drop partitions older than ``keep_months``; returns [(name, path, rows)]"""
+    if keep_months is None:
+        keep_months = settings.LOGIN_LOG_RETENTION_MONTHS
+    archive_dir = archive_dir or settings.LOGIN_LOG_ARCHIVE_DIR
+
+    today = date.today()
+    months = today.year * 12 + today.month - 1 - keep_months
+    cutoff = date(months // 12, months % 12 + 1, 1)
+
+    archived = []
+    for name, month, attached, pending in list_partitions():
+        if month >= cutoff:
+            continue
+        if dry_run:
+            archived.append((name, None, None))
+            continue
+        if attached:
+            if pending:
+                logger.info(f"Finishing interrupted detach of {name}")
+            _detach(name, pending)
+        path, rows = _archive(name, archive_dir)
+        logger.info(f"Archived {name}: {rows} rows to {path}")
+        archived.append((name, path, rows))
+    return archived
+
+def start_partition_upkeep():
+    # Off the startup path; a failure is logged and retried by the cron job
+    def run():
+        try:
+            ensure_partitions()
+        except Exception as e:
+            logger.error(f"login_logs partition check failed: {e}")
+    threading.Thread(target=run, name="login-log-partitions", daemon=True).start()
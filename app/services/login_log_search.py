@@ -0,0 +1,104 @@
+"""Filters and keyset paging for the admin login-log explorer.
+
+Every filter maps to an index that leads with the filtered column and then
+``(login_time DESC, id DESC)``, the page order (see migrate_database.py):
+
+    username   = exact             idx_login_logs_username
+    ip         = exact, or "10.2.*" prefix   idx_login_logs_ip
+    country    = exact             idx_login_logs_country
+    success    = failures only     idx_login_logs_failed (partial)
+    since/until                    partition pruning + idx_login_logs_time_id
+
+So a page is an index range scan that stops after ``page_size + 1`` rows,
+and with login_logs partitioned by month only the partitions in the time
+range (newest first) are read. Pages use the same opaque tokens as the
+patient lists (app/db/keyset.py).
+"""
+from app.db.keyset import keyset_query
+from datetime import datetime
+from urllib.parse import urlencode
+
+PAGE_SIZE = 50
+
+LOG_COLUMNS = """l.id, l.username, l.login_time, l.ip_address, l.country, l.region, l.city,
+                 l.isp, l.success, l.user_agent"""
+
+EXPORT_COLUMNS = ["id", "username", "login_time", "ip_address", "country", "region", "city",
+                  "latitude", "longitude", "isp", "success", "user_agent"]
+
+def _timestamp(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"invalid {name}: {value!r}")
+
+def login_log_filter(username="", ip="", success="", country="", since="", until=""):
+    """WHERE clause, params and the cleaned filters (for links back to this view).
+
+    Empty values are ignored; raises ValueError on a bad success flag or time.
+    """
+    username, ip, country = username.strip(), ip.strip(), country.strip()
+    success, since, until = success.strip().lower(), since.strip(), until.strip()
+    clauses, params, applied = [], [], {}
+
+    if username:
+        clauses.append("l.username = %s")
+        params.append(username)
+        applied["username"] = username
+    if ip:
+        if ip.endswith("*"):
+            prefix = ip.rstrip("*").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("l.ip_address LIKE %s")
+            params.append(prefix + "%")
+        else:
+            clauses.append("l.ip_address = %s")
+            params.append(ip)
+        applied["ip"] = ip
+    if success:
+        if success not in ("1", "0", "true", "false"):
+            raise ValueError(f"invalid success filter: {success!r}")
+        clauses.append("l.success" if success in ("1", "true") else "NOT l.success")
+        applied["success"] = "1" if success in ("1", "true") else "0"
+    if country:
+        clauses.append("l.country = %s")
+        params.append(country)
+        applied["country"] = country
+    if since:
+        clauses.append("l.login_time >= %s")
+        params.append(_timestamp(since, "since"))
+        applied["since"] = since
+    if until:
+        clauses.append("l.login_time < %s")
+        params.append(_timestamp(until, "until"))
+        applied["until"] = until
+
+    return " AND ".join(clauses), params, applied
+
+def login_log_page_query(where, params, page, page_size=PAGE_SIZE):
+    """(sql, params, direction) for one keyset page of filtered login logs"""
+    page_where, page_params, order_by, direction = keyset_query(page, alias="l", column="login_time")
+    conditions = [f"({c})" for c in (where, page_where) if c]
+    where_sql = "WHERE " + " AND ".join(conditions) if conditions else ""
+    sql = f"""
+        SELECT {LOG_COLUMNS}
+        FROM login_logs l
+        {where_sql}
+        ORDER BY {order_by}
+        LIMIT %s
+    """
+    return sql, (*params, *page_params, page_size + 1), direction
+
+def login_log_export_query(where, params):
+    where_sql = f"WHERE {where}" if where else ""
+    sql = f"""
+        SELECT l.id, l.username, l.login_time, l.ip_address, l.country, l.region, l.city,
+               l.latitude, l.longitude, l.isp, l.success, l.user_agent
+        FROM login_logs l
+        {where_sql}
+        ORDER BY l.login_time DESC, l.id DESC
+    """
+    return sql, params
+
+def filter_query_string(applied):
+    """``a=1&b=2`` for the applied filters, to carry them into page and export links"""
+    return urlencode(applied)
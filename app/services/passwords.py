@@ -0,0 +1,89 @@
+"""Password hashing with scrypt (hashlib, no extra dependency).
+
+Stored format: ``scrypt$<n>$<r>$<p>$<salt b64>$<hash b64>``. The cost is
+set by PASSWORD_SCRYPT_N/R/P; scrypt needs about 128 * n * r bytes of
+memory per hash (16 MiB at the defaults n=2**14, r=8). Hashes made with
+other parameters still verify and are flagged for rehash, so raising the
+cost takes effect as users log in. Values without the ``scrypt$`` prefix
+are legacy plaintext: they are compared in constant time, flagged for
+rehash, and can be converted in bulk with migrate_passwords.py.
+
+scrypt releases the GIL, so the async helpers run it on a fixed-size
+thread pool (PASSWORD_HASH_WORKERS, default one per core) and never on the
+event loop; at most PASSWORD_HASH_QUEUE hashes wait for a worker, further
+callers wait on a semaphore.
+"""
+from app.core.config import get_settings
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+
+PREFIX = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+settings = get_settings()
+
+def _b64(data):
+    return base64.b64encode(data).decode().rstrip("=")
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + (1 << 20), dklen=KEY_BYTES)
+
+def current_params():
+    return settings.PASSWORD_SCRYPT_N, settings.PASSWORD_SCRYPT_R, settings.PASSWORD_SCRYPT_P
+
+def hash_password(password, params=None):
+    n, r, p = params or current_params()
+    salt = os.urandom(SALT_BYTES)
+    return f"{PREFIX}${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(PREFIX + "$")
+
+def verify_password(password, stored):
+    """Return (matches, needs_rehash)"""
+    if not stored:
+        return False, False
+    if not is_hashed(stored):
+        matches = hmac.compare_digest(password.encode(), stored.encode())
+        return matches, matches
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        actual = _scrypt(password, _unb64(salt), n, r, p)
+    except (ValueError, MemoryError):
+        return False, False
+    matches = hmac.compare_digest(actual, _unb64(expected))
+    return matches, matches and (n, r, p) != current_params()
+
+# Verified against when the username doesn't exist, so both cases cost the same
+DUMMY_HASH = hash_password("not a real password")
+
+_workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+hash_pool = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix="password-hash")
+_slots = None
+
+def _semaphore():
+    # Created lazily so it binds to the running loop
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(_workers + settings.PASSWORD_HASH_QUEUE)
+    return _slots
+
+async def _run(fn, *args):
+    async with _semaphore():
+        return await asyncio.get_running_loop().run_in_executor(hash_pool, fn, *args)
+
+async def verify_password_async(password, stored):
+    return await _run(verify_password, password, stored)
+
+async def hash_password_async(password):
+    return await _run(hash_password, password)
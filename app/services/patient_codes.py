@@ -0,0 +1,104 @@
+"""Patient code allocation from Postgres sequences.
+
+Codes come from ``patient_code_seq`` (created by migrate_database.py), or
+from one ``patient_code_seq_c<clinic_id>`` sequence per clinic when
+PATIENT_CODE_PER_CLINIC is set, in which case the clinic id is part of the
+code. Numbers are fetched ``block_size`` at a time in one round trip and
+handed out from memory, so registering a patient costs no extra query most
+of the time and concurrent registrations can never draw the same number.
+Numbers left in a block when the process exits are skipped; codes are
+unique, not gapless.
+
+Per-clinic sequences are created by the migration for existing clinics; a
+sequence for a newer clinic is created on first use in its own committed
+transaction (never the caller's, which may still roll back).
+"""
+from app.db.context import get_db_cursor
+from app.db.async_context import get_async_cursor
+from app.core.config import get_settings
+from collections import deque
+import threading
+
+SEQUENCE = "patient_code_seq"
+
+class PatientCodeAllocator:
+    def __init__(self, prefix="PAT", block_size=20, per_clinic=False):
+        self.prefix = prefix
+        self.block_size = block_size
+        self.per_clinic = per_clinic
+        self._lock = threading.Lock()
+        self._blocks = {}          # sequence name -> deque of unused numbers
+        self._created = set()      # per-clinic sequences known to be committed
+
+    def _sequence(self, clinic_id):
+        if not self.per_clinic:
+            return SEQUENCE
+        return f"{SEQUENCE}_c{int(clinic_id)}"
+
+    def _format(self, number, clinic_id):
+        if self.per_clinic:
+            return f"{self.prefix}{int(clinic_id):02d}-{number:06d}"
+        return f"{self.prefix}{number:06d}"
+
+    def _take(self, sequence, count):
+        with self._lock:
+            block = self._blocks.setdefault(sequence, deque())
+            taken = []
+            while block and len(taken) < count:
+                taken.append(block.popleft())
+            return taken
+
+    def _keep(self, sequence, numbers):
+        with self._lock:
+            self._blocks.setdefault(sequence, deque()).extend(numbers)
+
+    def _fetch_sql(self, sequence):
+        return f"SELECT nextval('{sequence}') FROM generate_series(1, %s)"
+
+    def _create_sql(self, sequence):
+        return f"CREATE SEQUENCE IF NOT EXISTS {sequence}"
+
+    def _split(self, sequence, taken, fetched, count, clinic_id):
+        needed = count - len(taken)
+        taken = taken + fetched[:needed]
+        self._keep(sequence, fetched[needed:])
+        return [self._format(n, clinic_id) for n in taken]
+
+    def allocate_many(self, cursor, count, clinic_id=None):
+        """``count`` new codes using a psycopg2 cursor (bulk paths)"""
+        sequence = self._sequence(clinic_id)
+        taken = self._take(sequence, count)
+        if len(taken) == count:
+            return [self._format(n, clinic_id) for n in taken]
+        if self.per_clinic and sequence not in self._created:
+            with get_db_cursor() as create_cursor:
+                create_cursor.execute(self._create_sql(sequence))
+            self._created.add(sequence)
+        cursor.execute(self._fetch_sql(sequence), (max(self.block_size, count - len(taken)),))
+        fetched = [row[0] for row in cursor.fetchall()]
+        return self._split(sequence, taken, fetched, count, clinic_id)
+
+    async def allocate_many_async(self, cursor, count, clinic_id=None):
+        """``count`` new codes using a get_async_cursor() cursor"""
+        sequence = self._sequence(clinic_id)
+        taken = self._take(sequence, count)
+        if len(taken) == count:
+            return [self._format(n, clinic_id) for n in taken]
+        if self.per_clinic and sequence not in self._created:
+            async with get_async_cursor() as create_cursor:
+                await create_cursor.execute(self._create_sql(sequence))
+            self._created.add(sequence)
+        await cursor.execute(self._fetch_sql(sequence), (max(self.block_size, count - len(taken)),))
+        fetched = [row[0] for row in await cursor.fetchall()]
+        return self._split(sequence, taken, fetched, count, clinic_id)
+
+    async def allocate_async(self, cursor, clinic_id=None):
+        return (await self.allocate_many_async(cursor, 1, clinic_id))[0]
+
+settings = get_settings()
+
+patient_codes = PatientCodeAllocator(
+    prefix=settings.PATIENT_CODE_PREFIX,
+    block_size=settings.PATIENT_CODE_BLOCK_SIZE,
+    per_clinic=settings.PATIENT_CODE_PER_CLINIC,
+)
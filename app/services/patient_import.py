@@ -0,0 +1,250 @@
+"""Bulk patient import for onboarding a clinic's legacy records.
+
+An upload (CSV with a header row, or NDJSON) is streamed through a chain of
+generators: parse -> normalize/validate -> batches. Each batch gets its
+patient codes from one sequence round trip, is COPYed into a temporary
+staging table and merged into ``patients`` with a single INSERT ... SELECT.
+Rows that fail validation, or that match an existing patient of the same
+clinic by name and phone, are reported by line number and the rest of the
+file carries on. Every batch commits on its own, so a failure late in a
+large file keeps the batches already loaded.
+"""
+from app.db.context import get_db_cursor
+from app.services.patient_codes import patient_codes
+from app.services.patient_suggest import suggest_index
+from datetime import datetime
+from itertools import islice
+import csv
+import io
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+FIELDS = ["full_name", "age", "gender", "phone", "address", "emergency_contact", "emergency_phone"]
+
+# Header spellings seen in legacy exports -> our field names
+ALIASES = {
+    "name": "full_name",
+    "patient_name": "full_name",
+    "sex": "gender",
+    "mobile": "phone",
+    "phone_number": "phone",
+    "contact": "phone",
+}
+
+GENDERS = {"m": "Male", "male": "Male", "f": "Female", "female": "Female",
+           "o": "Other", "other": "Other"}
+
+_SPACES = re.compile(r"\s+")
+_PHONE = re.compile(r"^\+?[\d\s\-()]{6,20}$")
+
+STAGE_COLUMNS = ["line_no", "patient_id", "full_name", "age", "gender", "phone", "address",
+                 "emergency_contact", "emergency_phone"]
+
+class RowError(ValueError):
+    pass
+
+def parse_csv(stream):
+    """(line number, record) for each data row of a CSV text stream"""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+def parse_ndjson(stream):
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, RowError(f"invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield line_no, RowError("expected a JSON object")
+            continue
+        yield line_no, record
+
+PARSERS = {"csv": parse_csv, "ndjson": parse_ndjson}
+
+def _text(value, limit, field):
+    value = _SPACES.sub(" ", str(value)).strip() if value is not None else ""
+    if len(value) > limit:
+        raise RowError(f"{field} longer than {limit} characters")
+    return value or None
+
+def normalize(record):
+    """One import row as a tuple in FIELDS order; raises RowError"""
+    record = {ALIASES.get(k.strip().lower(), k.strip().lower()): v
+              for k, v in record.items() if k}
+
+    name = _text(record.get("full_name"), 255, "full_name")
+    if not name:
+        raise RowError("full_name is required")
+
+    age = record.get("age")
+    if age in (None, ""):
+        age = None
+    else:
+        try:
+            age = int(float(age))
+        except (TypeError, ValueError):
+            raise RowError(f"age is not a number: {age!r}")
+        if not 0 <= age <= 150:
+            raise RowError(f"age out of range: {age}")
+
+    gender = _text(record.get("gender"), 10, "gender")
+    if gender:
+        if gender.lower() not in GENDERS:
+            raise RowError(f"unknown gender: {gender!r}")
+        gender = GENDERS[gender.lower()]
+
+    phones = []
+    for field in ("phone", "emergency_phone"):
+        phone = _text(record.get(field), 20, field)
+        if phone and not _PHONE.match(phone):
+            raise RowError(f"{field} is not a phone number: {phone!r}")
+        phones.append(phone)
+
+    return (name, age, gender, phones[0],
+            _text(record.get("address"), 1000, "address"),
+            _text(record.get("emergency_contact"), 255, "emergency_contact"),
+            phones[1])
+
+def validated(records, errors):
+    """Drop rows that don't validate, recording them in ``errors``"""
+    for line_no, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            yield line_no, normalize(record)
+        except RowError as e:
+            errors.append((line_no, str(e)))
+
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def _copy_value(value):
+    if value is None:
+        return r"\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+def _copy_buffer(rows):
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    return buf
+
+class ErrorLog(list):
+    """Per-row errors, keeping the first MAX_REPORTED_ERRORS but counting all"""
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def append(self, item):
+        self.count += 1
+        if len(self) < MAX_REPORTED_ERRORS:
+            super().append(item)
+
+def _load_batch(cur, batch, clinic_id, created_by, now):
+    """COPY one batch into the staging table and merge it; returns duplicates and new rows"""
+    codes = patient_codes.allocate_many(cur, len(batch), clinic_id)
+    cur.execute("TRUNCATE patient_import_stage")
+    cur.copy_expert(
+        f"COPY patient_import_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN",
+        _copy_buffer((line_no, code) + row for (line_no, row), code in zip(batch, codes)))
+
+    # Same clinic, same name and phone: treat as already registered
+    cur.execute("""
+        DELETE FROM patient_import_stage s
+        USING patients p
+        WHERE p.clinic_id = %s AND p.phone = s.phone
+          AND lower(p.full_name) = lower(s.full_name)
+        RETURNING s.line_no, p.patient_id
+    """, (clinic_id,))
+    duplicates = cur.fetchall()
+
+    cur.execute("""
+        INSERT INTO patients (patient_id, full_name, age, gender, phone, address,
+                              emergency_contact, emergency_phone, clinic_id, created_by, created_at)
+        SELECT patient_id, full_name, age, gender, phone, address,
+               emergency_contact, emergency_phone, %s, %s, %s
+        FROM patient_import_stage
+        ORDER BY line_no
+        RETURNING id, patient_id, full_name, phone
+    """, (clinic_id, created_by, now))
+    return duplicates, cur.fetchall()
+
+def import_patients(stream, fmt, clinic_id, created_by=None, batch_size=BATCH_SIZE):
+    """Import patients from a text stream of ``fmt`` ('csv' or 'ndjson').
+
+    Returns a summary dict with counts, rows/sec and per-row errors as
+    ``{"line": n, "error": "..."}``; ``rejected`` includes duplicates.
+    """
+    if fmt not in PARSERS:
+        raise ValueError(f"unsupported import format: {fmt!r}")
+
+    started = time.perf_counter()
+    errors = ErrorLog()
+    imported = duplicates = 0
+    now = datetime.now()
+
+    with get_db_cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS patient_import_stage (
+                line_no INTEGER,
+                patient_id VARCHAR(50),
+                full_name VARCHAR(255),
+                age INTEGER,
+                gender VARCHAR(10),
+                phone VARCHAR(20),
+                address TEXT,
+                emergency_contact VARCHAR(255),
+                emergency_phone VARCHAR(20)
+            )
+        """)
+        cur.connection.commit()
+        for batch in batched(validated(PARSERS[fmt](stream), errors), batch_size):
+            try:
+                dup_rows, new_rows = _load_batch(cur, batch, clinic_id, created_by, now)
+                cur.connection.commit()
+            except Exception as e:
+                cur.connection.rollback()
+                logger.error(f"Patient import batch at line {batch[0][0]} failed: {e}")
+                for line_no, _ in batch:
+                    errors.append((line_no, f"batch failed: {e}"))
+                continue
+
+            for line_no, code in dup_rows:
+                errors.append((line_no, f"duplicate of existing patient {code}"))
+            duplicates += len(dup_rows)
+            imported += len(new_rows)
+            for pk, code, name, phone in new_rows:
+                suggest_index.add(pk, code, name, phone, clinic_id)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Patient import: {imported} imported, {errors.count} rejected in {elapsed:.1f}s")
+    return {
+        "imported": imported,
+        "duplicates": duplicates,
+        "rejected": errors.count,
+        "elapsed_sec": round(elapsed, 3),
+        "rows_per_sec": round((imported + errors.count) / elapsed) if elapsed else 0,
+        "errors": [{"line": line_no, "error": msg} for line_no, msg in sorted(errors)],
+    }
+
+def detect_format(filename):
+    return "ndjson" if (filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
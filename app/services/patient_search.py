@@ -0,0 +1,62 @@
+from app.db.async_context import get_async_cursor
+from app.db.batch import QueryBatch
+from app.core.config import get_settings
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_NON_DIGIT = re.compile(r"\D")
+_SPACES = re.compile(r"\s+")
+
+# Matches the expression index created by migrate_database.py
+PHONE_DIGITS_SQL = r"regexp_replace(p.phone, '\D', '', 'g')"
+
+def normalize_query(q: str):
+    """Return (text, digits) for a front-desk search string"""
+    text = _SPACES.sub(" ", q).strip().lower()
+    digits = _NON_DIGIT.sub("", q)
+    return text, digits
+
+async def find_patients(q: str, limit: int = None):
+    """Top-K patients for ``q`` ranked by trigram similarity.
+
+    Names match on word similarity, so typos and transliteration variants
+    ("Mohammad"/"Muhammad") still hit; phone numbers compare on digits only
+    and patient codes on substring. All three predicates are served by the
+    pg_trgm GIN indexes.
+    """
+    cfg = get_settings()
+    limit = limit or cfg.SEARCH_TOP_K
+    text, digits = normalize_query(q)
+    if not text:
+        return []
+
+    # Phone matching only makes sense once a few digits have been typed
+    phone_like = f"%{digits}%" if len(digits) >= 3 else None
+
+    batch = QueryBatch()
+    batch.scalar("threshold",
+        "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+        (str(cfg.SEARCH_SIMILARITY_THRESHOLD),))
+    batch.rows("patients", f"""
+        SELECT p.id, p.patient_id, p.full_name AS name, p.age, p.gender, p.phone, p.address,
+               COALESCE(c.name, 'Unknown') as clinic_name, p.created_at,
+               (SELECT COUNT(*) FROM visits v WHERE v.patient_id = p.id) AS visit_count,
+               GREATEST(
+                   word_similarity(%(text)s, p.full_name),
+                   CASE WHEN p.patient_id ILIKE %(like)s THEN 1.0 ELSE 0 END,
+                   CASE WHEN {PHONE_DIGITS_SQL} LIKE %(phone_like)s THEN 0.9 ELSE 0 END
+               ) AS score
+        FROM patients p
+        LEFT JOIN clinics c ON p.clinic_id = c.id
+        WHERE %(text)s <%% p.full_name
+           OR p.patient_id ILIKE %(like)s
+           OR {PHONE_DIGITS_SQL} LIKE %(phone_like)s
+        ORDER BY score DESC, p.created_at DESC
+        LIMIT %(limit)s
+    """, {"text": text, "like": f"%{text}%", "phone_like": phone_like, "limit": limit})
+
+    async with get_async_cursor() as cursor:
+        results = await batch.run(cursor.connection)
+    return results["patients"]
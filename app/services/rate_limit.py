@@ -0,0 +1,141 @@
+"""Login rate limiting by client IP and by username.
+
+Each key gets a token bucket: ``burst`` attempts at once, refilled at
+``per_min`` a minute. Buckets live in an OrderedDict capped at ``max_keys``;
+the least recently used key is evicted when it is full, so memory stays
+bounded whatever a bot sprays at us (an evicted key just starts again with
+a full bucket).
+
+With LOGIN_RATE_BACKEND=postgres the in-process buckets still run first
+and reject bursts without touching the database; attempts they allow are
+then checked against buckets in the unlogged ``login_rate_limits`` table
+(one upsert for both keys), so the limits hold across worker processes.
+"""
+from app.db.async_context import get_async_cursor
+from app.core.config import get_settings
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class TokenBuckets:
+    def __init__(self, per_min, burst, max_keys=100000):
+        self.rate = per_min / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.evictions = 0
+        self._buckets = OrderedDict()   # key -> (tokens, last refill time)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Spend one token; return 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return 0 if allowed else (1 - tokens) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+SHARED_SQL = """
+    INSERT INTO login_rate_limits AS b (key, tokens, updated_at)
+    SELECT key, burst - 1, now()
+    FROM (VALUES (%(ip_key)s, %(ip_burst)s::float8, %(ip_rate)s::float8),
+                 (%(user_key)s, %(user_burst)s::float8, %(user_rate)s::float8))
+         AS v (key, burst, rate)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = GREATEST(-1, LEAST(
+            CASE WHEN b.key = %(ip_key)s THEN %(ip_burst)s::float8 ELSE %(user_burst)s::float8 END,
+            b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at)
+                     * CASE WHEN b.key = %(ip_key)s THEN %(ip_rate)s::float8 ELSE %(user_rate)s::float8 END
+        ) - 1),
+        updated_at = now()
+    RETURNING key, tokens
+"""
+
+class LoginRateLimiter:
+    def __init__(self, ip_per_min, ip_burst, user_per_min, user_burst, max_keys=100000, backend="memory"):
+        self.by_ip = TokenBuckets(ip_per_min, ip_burst, max_keys)
+        self.by_user = TokenBuckets(user_per_min, user_burst, max_keys)
+        self.backend = backend
+        self.checked = 0
+        self.rejected_ip = 0
+        self.rejected_user = 0
+        self.shared_errors = 0
+        self._since_cleanup = 0
+
+    async def check(self, ip, username):
+        """0 if the attempt may proceed, else seconds the client should wait"""
+        self.checked += 1
+        user_key = (username or "").strip().lower()
+        wait = self.by_ip.take(ip)
+        if wait:
+            self.rejected_ip += 1
+            return wait
+        wait = self.by_user.take(user_key)
+        if wait:
+            self.rejected_user += 1
+            return wait
+        if self.backend == "postgres":
+            return await self._check_shared(ip, user_key)
+        return 0
+
+    async def _check_shared(self, ip, user_key):
+        params = {
+            "ip_key": f"ip:{ip}", "ip_burst": self.by_ip.burst, "ip_rate": self.by_ip.rate,
+            "user_key": f"user:{user_key}", "user_burst": self.by_user.burst, "user_rate": self.by_user.rate,
+        }
+        try:
+            async with get_async_cursor() as cur:
+                await cur.execute(SHARED_SQL, params)
+                tokens = dict(await cur.fetchall())
+                self._since_cleanup += 1
+                if self._since_cleanup >= 1000:
+                    self._since_cleanup = 0
+                    await cur.execute(
+                        "DELETE FROM login_rate_limits WHERE updated_at < now() - interval '1 day'")
+        except Exception as e:
+            # Fail open: the in-process limits above still apply
+            self.shared_errors += 1
+            logger.error(f"Shared rate limit check failed: {e}")
+            return 0
+        if tokens[params["ip_key"]] < 0:
+            self.rejected_ip += 1
+            return 1 / self.by_ip.rate
+        if tokens[params["user_key"]] < 0:
+            self.rejected_user += 1
+            return 1 / self.by_user.rate
+        return 0
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "checked": self.checked,
+            "rejected_ip": self.rejected_ip,
+            "rejected_user": self.rejected_user,
+            "ip_keys": len(self.by_ip),
+            "user_keys": len(self.by_user),
+            "evictions": self.by_ip.evictions + self.by_user.evictions,
+            "shared_errors": self.shared_errors,
+        }
+
+settings = get_settings()
+
+login_limiter = LoginRateLimiter(
+    ip_per_min=settings.LOGIN_RATE_IP_PER_MIN,
+    ip_burst=settings.LOGIN_RATE_IP_BURST,
+    user_per_min=settings.LOGIN_RATE_USER_PER_MIN,
+    user_burst=settings.LOGIN_RATE_USER_BURST,
+    max_keys=settings.LOGIN_RATE_MAX_KEYS,
+    backend=settings.LOGIN_RATE_BACKEND,
+)
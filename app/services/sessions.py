@@ -0,0 +1,246 @@
+"""Server-side sessions.
+
+The cookie carries only an opaque random session ID; the session dict lives
+in the ``sessions`` table, with recently used sessions kept in an in-process
+LRU. A request for a cached session costs a dict lookup: no signature
+check, no base64/JSON decode and no Set-Cookie on the response. The cookie
+is set once, when a session is created (or rotated on login), and cleared
+on logout.
+
+Expiry is sliding: every request pushes ``expires_at`` SESSION_TIMEOUT_MIN
+into the future. Those last-seen updates are coalesced per session and
+written in one UPDATE every SESSION_TOUCH_FLUSH_SEC. Deleting a session
+(logout, ``revoke_user``) removes it from this process at once.
+``revoke_user`` also sends NOTIFY session_revoked so other workers drop
+the user's cached sessions too; as a fallback they re-read a cached
+session from the table at least every SESSION_CACHE_TTL_SEC.
+
+``ServerSessionMiddleware`` fills ``request.session`` exactly like
+Starlette's SessionMiddleware, so routes don't change.
+"""
+from app.db.async_context import get_async_cursor
+from app.db.notify import pg_listener
+from app.core.config import get_settings
+from collections import OrderedDict
+from psycopg.types.json import Jsonb
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+import asyncio
+import logging
+import secrets
+import time
+
+logger = logging.getLogger(__name__)
+
+def _user_id(data):
+    user = (data or {}).get("user")
+    return user.get("id") if isinstance(user, dict) else None
+
+class SessionStore:
+    def __init__(self, timeout_min=30, cache_size=10000, cache_ttl=60.0, flush_interval=15.0):
+        self.timeout = timeout_min * 60
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self._cache = OrderedDict()   # sid -> [data, user_id, expires_at, loaded_at]
+        self._touched = {}            # sid -> last seen (epoch seconds), waiting for flush
+        self._task = None
+
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.deleted = 0
+        self.touches_written = 0
+        self.flush_errors = 0
+
+    def _remember(self, sid, data, expires_at, now):
+        self._cache[sid] = [data, _user_id(data), expires_at, now]
+        self._cache.move_to_end(sid)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _forget(self, sid):
+        self._cache.pop(sid, None)
+        self._touched.pop(sid, None)
+
+    async def get(self, sid):
+        """Session dict for ``sid``, or None if unknown or expired"""
+        now = time.time()
+        entry = self._cache.get(sid)
+        if entry is not None and entry[2] > now and now - entry[3] < self.cache_ttl:
+            self.hits += 1
+            self._cache.move_to_end(sid)
+        else:
+            self.misses += 1
+            async with get_async_cursor() as cur:
+                await cur.execute("""
+                    SELECT data, EXTRACT(EPOCH FROM expires_at)::float8 AS expires_at
+                    FROM sessions
+                    WHERE id = %s AND expires_at > now()
+                """, (sid,))
+                row = await cur.fetchone()
+            if row is None:
+                self._forget(sid)
+                return None
+            # Our own unflushed touches may be newer than the table
+            expires_at = max(row.expires_at, entry[2] if entry else 0)
+            self._remember(sid, row.data, expires_at, now)
+            entry = self._cache[sid]
+
+        entry[2] = now + self.timeout
+        self._touched[sid] = now
+        return entry[0]
+
+    async def create(self, data):
+        sid = secrets.token_urlsafe(32)
+        now = time.time()
+        async with get_async_cursor() as cur:
+            await cur.execute("""
+                INSERT INTO sessions (id, user_id, data, created_at, last_seen_at, expires_at)
+                VALUES (%s, %s, %s, now(), now(), now() + make_interval(secs => %s))
+            """, (sid, _user_id(data), Jsonb(data), self.timeout))
+        self._remember(sid, data, now + self.timeout, now)
+        self.created += 1
+        return sid
+
+    async def save(self, sid, data):
+        async with get_async_cursor() as cur:
+            await cur.execute("UPDATE sessions SET data = %s, user_id = %s WHERE id = %s",
+                              (Jsonb(data), _user_id(data), sid))
+        entry = self._cache.get(sid)
+        if entry is not None:
+            entry[0], entry[1] = data, _user_id(data)
+
+    async def delete(self, sid):
+        self._forget(sid)
+        async with get_async_cursor() as cur:
+            await cur.execute("DELETE FROM sessions WHERE id = %s", (sid,))
+        self.deleted += 1
+
+    def forget_user(self, user_id=None):
+        """Drop cached sessions of one user, or all of them"""
+        for sid in [sid for sid, entry in self._cache.items() if user_id is None or entry[1] == user_id]:
+            self._forget(sid)
+
+    async def revoke_user(self, user_id):
+        """End every session of a user. Nothing calls this on its own: run it
+        (POST /admin/users/{id}/sessions/revoke) after deactivating a user or
+        resetting their password, so existing logins end too"""
+        self.forget_user(user_id)
+        async with get_async_cursor() as cur:
+            await cur.execute("DELETE FROM sessions WHERE user_id = %s", (user_id,))
+            revoked = cur.rowcount
+            await cur.execute("SELECT pg_notify('session_revoked', %s)", (str(user_id),))
+        self.deleted += revoked
+        return revoked
+
+    def on_notify(self, payload):
+        self.forget_user(int(payload) if payload else None)
+
+    async def flush(self):
+        """Write pending last-seen times; expired rows are purged along the way"""
+        touched, self._touched = self._touched, {}
+        if not touched:
+            return 0
+        try:
+            async with get_async_cursor() as cur:
+                await cur.execute("""
+                    UPDATE sessions s
+                    SET last_seen_at = to_timestamp(v.seen),
+                        expires_at = to_timestamp(v.seen) + make_interval(secs => %s)
+                    FROM unnest(%s::text[], %s::float8[]) AS v (id, seen)
+                    WHERE s.id = v.id AND s.expires_at < to_timestamp(v.seen) + make_interval(secs => %s)
+                """, (self.timeout, list(touched), list(touched.values()), self.timeout))
+                await cur.execute("DELETE FROM sessions WHERE expires_at < now()")
+        except Exception as e:
+            self.flush_errors += 1
+            logger.error(f"Session touch flush failed: {e}")
+            # Keep them for the next round unless newer touches arrived
+            for sid, seen in touched.items():
+                self._touched.setdefault(sid, seen)
+            return 0
+        self.touches_written += len(touched)
+        return len(touched)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created,
+            "deleted": self.deleted,
+            "pending_touches": len(self._touched),
+            "touches_written": self.touches_written,
+            "flush_errors": self.flush_errors,
+        }
+
+class ServerSessionMiddleware:
+    """Drop-in for SessionMiddleware backed by a SessionStore"""
+    def __init__(self, app, store, cookie_name="ehr_session", https_only=False, same_site="lax"):
+        self.app = app
+        self.store = store
+        self.cookie_name = cookie_name
+        self.flags = f"; path=/; httponly; samesite={same_site}" + ("; secure" if https_only else "")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        sid = HTTPConnection(scope).cookies.get(self.cookie_name)
+        initial = None
+        if sid:
+            try:
+                initial = await self.store.get(sid)
+            except Exception as e:
+                logger.error(f"Session lookup failed: {e}")
+        scope["session"] = dict(initial) if initial else {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                await self._commit(scope["session"], sid, initial, MutableHeaders(scope=message))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _commit(self, session, sid, initial, headers):
+        if session == (initial or {}):
+            return
+        if not session:
+            if initial is not None:
+                await self.store.delete(sid)
+                headers.append("Set-Cookie", f"{self.cookie_name}=null{self.flags}; max-age=0")
+            return
+        if initial is not None and _user_id(session) == _user_id(initial):
+            await self.store.save(sid, session)
+            return
+        # New session, or a different user on this one: issue a fresh ID
+        if initial is not None:
+            await self.store.delete(sid)
+        new_sid = await self.store.create(session)
+        headers.append("Set-Cookie", f"{self.cookie_name}={new_sid}{self.flags}")
+
+settings = get_settings()
+
+session_store = SessionStore(
+    timeout_min=settings.SESSION_TIMEOUT_MIN,
+    cache_size=settings.SESSION_CACHE_SIZE,
+    cache_ttl=settings.SESSION_CACHE_TTL_SEC,
+    flush_interval=settings.SESSION_TOUCH_FLUSH_SEC,
+)
+pg_listener.on("session_revoked", session_store.on_notify)
@@ -0,0 +1,57 @@
+"""Headline row counts (total patients, total login attempts).
+
+HEADLINE_COUNT_MODE picks how they are answered:
+
+- ``counters``: sum of the daily_counts rows (app/services/counters.py);
+  exact, and cheap while the number of clinic-days stays small.
+- ``estimate``: planner statistics, no table access at all. The figure is
+  ``pg_stat_user_tables.n_live_tup``, which ANALYZE/VACUUM set to the
+  sampled ``pg_class.reltuples`` and which then moves by every insert and
+  delete committed since, falling back to ``reltuples`` when the stats
+  collector has nothing. Partitions are summed. Typically within a
+  fraction of a percent of the true count; see
+  benchmarks/bench_table_counts.py.
+- ``exact``: plain COUNT(*), which has to read the whole table.
+
+Callers can always pass ``exact=True`` (e.g. from an ``?exact=1`` query
+parameter) to get COUNT(*) regardless of the mode.
+"""
+from app.core.config import get_settings
+from app.services.counters import counter_sql
+
+# Tables we report headline counts for, and their daily_counts column
+TABLES = {"patients": "patients_registered", "login_logs": "login_attempts"}
+
+MODES = ("counters", "estimate", "exact")
+
+ESTIMATE_SQL = """
+    SELECT COALESCE(SUM(
+               CASE WHEN s.n_live_tup > 0 OR c.reltuples <= 0 THEN COALESCE(s.n_live_tup, 0)
+                    ELSE c.reltuples END), 0)::bigint
+    FROM pg_class c
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE c.relkind = 'r'
+      AND (c.oid = %(table)s::regclass
+           OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %(table)s::regclass))
+"""
+
+def count_sql(table, exact=False, mode=None):
+    """(sql, params, approximate) for the number of rows in ``table``"""
+    if table not in TABLES:
+        raise ValueError(f"no headline count for table: {table}")
+    mode = mode or get_settings().HEADLINE_COUNT_MODE
+    if mode not in MODES:
+        raise ValueError(f"unknown HEADLINE_COUNT_MODE: {mode}")
+
+    if exact or mode == "exact":
+        return f"SELECT COUNT(*) FROM {table}", (), False
+    if mode == "estimate":
+        return ESTIMATE_SQL, {"table": table}, True
+    sql, params = counter_sql(TABLES[table])
+    return sql, params, False
+
+def read_count(cur, table, exact=False):
+    """Return (count, approximate) using a psycopg2 cursor"""
+    sql, params, approximate = count_sql(table, exact)
+    cur.execute(sql, params)
+    return cur.fetchone()[0], approximate
@@ -0,0 +1,130 @@
+"""Current user/role context for permission checks.
+
+The session only says *who* is logged in; what they may do (role, clinic,
+whether the account is still active) is read through this cache, keyed by
+user id. Entries live USER_CONTEXT_TTL_SEC at most, and a trigger on
+``users`` sends NOTIFY user_changed on role, clinic, activation, password
+or profile changes, so every worker drops the entry at once
+(app/db/notify.py).
+A request for a cached user costs no query.
+
+Routes take the context as a dependency:
+
+    def page(request: Request, user: dict = Depends(current_user)): ...
+    def admin_page(request: Request, user: dict = Depends(require_admin)): ...
+
+Anonymous or deactivated users get LoginRequired, which main.py turns into
+a redirect to /login; logged-in users without the role get a 403.
+"""
+from app.db.async_context import get_async_cursor
+from app.db.notify import pg_listener
+from app.db.rows import row_to_dict
+from app.core.config import get_settings
+from app.services.clinic_directory import clinic_directory
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+import time
+
+EMOC_ROLES = ("admin", "manager", "emoc_staff")
+
+# Columns for context_from_row, selected FROM users u
+USER_COLUMNS = "u.id, u.username, u.full_name, u.email, u.phone, u.role, u.clinic_id"
+
+class LoginRequired(Exception):
+    pass
+
+async def context_from_row(row):
+    """Session-safe dict for a USER_COLUMNS row (never includes the password)"""
+    context = row_to_dict(row)
+    context.pop("password", None)
+    context["clinic_name"] = await clinic_directory.name_async(row.clinic_id, "All Clinics")
+    context["has_emoc"] = row.role in EMOC_ROLES
+    return context
+
+class UserContextCache:
+    def __init__(self, ttl=60, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()   # user_id -> (expires_at, context or None if inactive)
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, user_id):
+        """Context dict for an active user, else None"""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+        self.misses += 1
+        version = self._version
+        async with get_async_cursor() as cur:
+            await cur.execute(f"""
+                SELECT {USER_COLUMNS}
+                FROM users u
+                WHERE u.id = %s AND u.is_active = TRUE
+            """, (user_id,))
+            row = await cur.fetchone()
+        context = await context_from_row(row) if row else None
+
+        # Don't cache a row that was invalidated while we were reading it
+        if version == self._version:
+            self._entries[user_id] = (time.monotonic() + self.ttl, context)
+            self._entries.move_to_end(user_id)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return context
+
+    def invalidate(self, user_id=None):
+        self._version += 1
+        self.invalidations += 1
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def on_notify(self, payload):
+        self.invalidate(int(payload) if payload else None)
+
+    def stats(self):
+        return {"cached": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "invalidations": self.invalidations}
+
+settings = get_settings()
+
+user_contexts = UserContextCache(ttl=settings.USER_CONTEXT_TTL_SEC, maxsize=settings.USER_CONTEXT_CACHE_SIZE)
+pg_listener.on("user_changed", user_contexts.on_notify)
+
+async def current_user(request: Request):
+    """Dependency: the logged-in user's current context"""
+    session_user = request.session.get("user")
+    if not session_user or not session_user.get("id"):
+        raise LoginRequired()
+    context = await user_contexts.get(session_user["id"])
+    if context is None:
+        # Deactivated or deleted since login
+        request.session.clear()
+        raise LoginRequired()
+    if context != session_user:
+        request.session["user"] = context
+    return context
+
+def clinic_scope(user, clinic_id=None):
+    """Clinic a request may act on: admins and users not tied to a clinic may
+    pick any (None = all); everyone else is held to their own clinic"""
+    own = user.get("clinic_id")
+    if own is None or user.get("role") == "admin":
+        return clinic_id
+    if clinic_id is not None and clinic_id != own:
+        raise HTTPException(status_code=403, detail="Not allowed for this clinic")
+    return own
+
+async def require_admin(request: Request):
+    """Dependency: like current_user, but only for admins"""
+    user = await current_user(request)
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
@@ -0,0 +1,38 @@
+"""Daily upkeep for the partitioned login_logs table.
+
+Creates the coming months' partitions, then archives months older than the
+retention window to gzipped CSV files and drops them. Meant for a daily
+cron entry.
+
+    python archive_login_logs.py                      # settings defaults
+    python archive_login_logs.py --keep-months 6 --archive-dir /srv/ehr/archive
+    python archive_login_logs.py --dry-run            # list what would be archived
+"""
+from app.services.login_log_partitions import ensure_partitions, apply_retention
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and archive login_logs partitions")
+    parser.add_argument("--keep-months", type=int, help="months to keep online (default LOGIN_LOG_RETENTION_MONTHS)")
+    parser.add_argument("--archive-dir", help="where archives are written (default LOGIN_LOG_ARCHIVE_DIR)")
+    parser.add_argument("--dry-run", action="store_true", help="only list partitions that would be archived")
+    args = parser.parse_args()
+
+    logger.info("🚀 Checking login_logs partitions...")
+    created = ensure_partitions()
+    logger.info(f"✅ {created} new partitions created")
+
+    archived = apply_retention(args.keep_months, args.archive_dir, args.dry_run)
+    for name, path, rows in archived:
+        if args.dry_run:
+            logger.info(f"Would archive {name}")
+        else:
+            logger.info(f"📦 {name}: {rows} rows -> {path}")
+    logger.info(f"✅ {len(archived)} partitions {'to archive' if args.dry_run else 'archived'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Plan and latency of the per-clinic dashboard breakdown.
+
+--seed adds clinics named "Bench Clinic N" up to --clinics in total and
+fills daily_counts with --days of synthetic history for each, so point
+POSTGRES_DSN at a scratch database. The single grouped query is compared
+with the one-query-per-clinic-per-metric approach it replaces.
+
+    python -m benchmarks.bench_clinic_breakdown --seed --clinics 50 --days 1095
+"""
+import argparse
+import statistics
+import time
+
+from app.db.context import get_db_cursor
+from app.services.dashboard import CLINIC_BREAKDOWN_SQL
+
+PER_CLINIC_SQL = [
+    "SELECT COALESCE(SUM(patients_registered), 0) FROM daily_counts WHERE clinic_id = %s",
+    "SELECT COALESCE(SUM(visits), 0) FROM daily_counts WHERE clinic_id = %s AND day = CURRENT_DATE",
+    """SELECT COALESCE(SUM(revenue_paid), 0) FROM daily_counts
+       WHERE clinic_id = %s AND day >= date_trunc('month', CURRENT_DATE)""",
+    "SELECT COUNT(*) FROM users WHERE is_active = TRUE AND clinic_id = %s",
+]
+
+def seed(clinics, days):
+    with get_db_cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM clinics")
+        missing = clinics - cur.fetchone()[0]
+        if missing > 0:
+            print(f"adding {missing} clinics...")
+            cur.execute("""
+                INSERT INTO clinics (name)
+                SELECT 'Bench Clinic ' || g FROM generate_series(1, %s) g
+            """, (missing,))
+        print(f"seeding {days} days of counters per clinic...")
+        cur.execute("""
+            INSERT INTO daily_counts (clinic_id, day, patients_registered, visits,
+                                      visiting_patients, revenue_paid, login_attempts)
+            SELECT c.id, CURRENT_DATE - d,
+                   floor(random() * 20)::int, floor(random() * 60)::int,
+                   floor(random() * 50)::int, round((random() * 50000)::numeric, 2),
+                   floor(random() * 40)::int
+            FROM clinics c, generate_series(0, %s - 1) d
+            ON CONFLICT (clinic_id, day) DO NOTHING
+        """, (days,))
+        cur.execute("ANALYZE daily_counts")
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+def main(do_seed, clinics, days, repeat):
+    if do_seed:
+        seed(clinics, days)
+
+    with get_db_cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM daily_counts")
+        print(f"daily_counts rows: {cur.fetchone()[0]:,}")
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + CLINIC_BREAKDOWN_SQL, {"clinic_id": None})
+        print("\n".join(row[0] for row in cur.fetchall()))
+
+        cur.execute("SELECT id FROM clinics ORDER BY id")
+        clinic_ids = [row[0] for row in cur.fetchall()]
+
+        def grouped():
+            cur.execute(CLINIC_BREAKDOWN_SQL, {"clinic_id": None})
+            cur.fetchall()
+
+        def one_clinic():
+            cur.execute(CLINIC_BREAKDOWN_SQL, {"clinic_id": clinic_ids[0]})
+            cur.fetchall()
+
+        def per_clinic():
+            for clinic_id in clinic_ids:
+                for sql in PER_CLINIC_SQL:
+                    cur.execute(sql, (clinic_id,))
+                    cur.fetchone()
+
+        for label, fn in [("grouped, all clinics", grouped),
+                          ("grouped, one clinic", one_clinic),
+                          (f"per clinic ({len(clinic_ids) * len(PER_CLINIC_SQL)} queries)", per_clinic)]:
+            p50, worst = timed(fn, repeat)
+            print(f"{label}: p50 {p50:.2f} ms, max {worst:.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", action="store_true")
+    parser.add_argument("--clinics", type=int, default=50)
+    parser.add_argument("--days", type=int, default=1095)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.seed, args.clinics, args.days, args.repeat)
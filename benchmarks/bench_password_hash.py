@@ -0,0 +1,41 @@
+"""Logins/sec per core for the scrypt password hash at several costs.
+
+Times verify_password() on one thread, then through the password worker
+pool with all workers busy, for each N given (r and p come from the
+settings). No database needed beyond importing the app settings.
+
+    python -m benchmarks.bench_password_hash --n 8192 16384 32768 --verifies 200
+"""
+import argparse
+import os
+import time
+
+from app.services.passwords import hash_password, verify_password, hash_pool, current_params
+
+def main(costs, verifies):
+    _, r, p = current_params()
+    workers = hash_pool._max_workers
+    print(f"r={r} p={p}, {os.cpu_count()} cores, {workers} pool workers")
+    for n in costs:
+        stored = hash_password("correct horse battery staple", (n, r, p))
+        single = max(verifies // 10, 5)
+
+        start = time.perf_counter()
+        for _ in range(single):
+            verify_password("correct horse battery staple", stored)
+        per_login = (time.perf_counter() - start) / single
+
+        start = time.perf_counter()
+        list(hash_pool.map(verify_password, ["correct horse battery staple"] * verifies,
+                           [stored] * verifies))
+        pooled = verifies / (time.perf_counter() - start)
+
+        print(f"N={n:>6} ({128 * n * r / 2 ** 20:.0f} MiB): {per_login * 1000:.1f} ms/verify, "
+              f"{1 / per_login:.1f} logins/sec/core, {pooled:.1f} logins/sec through the pool")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, nargs="+", default=[8192, 16384, 32768])
+    parser.add_argument("--verifies", type=int, default=200)
+    args = parser.parse_args()
+    main(args.n, args.verifies)
@@ -0,0 +1,60 @@
+"""Rows/sec of the bulk patient importer.
+
+Generates a synthetic CSV (about 2% of rows invalid) and times the parse and
+validation pipeline on its own, then, unless --pipeline-only is given, a full
+import_patients() run into --clinic-id. The full run writes real patients,
+so point POSTGRES_DSN at a scratch database.
+
+    python -m benchmarks.bench_patient_import --rows 100000 --clinic-id 1
+"""
+import argparse
+import csv
+import io
+import random
+import time
+
+from app.services.patient_import import (
+    import_patients, parse_csv, validated, batched, ErrorLog, BATCH_SIZE)
+
+FIRST = ["Mohammad", "Muhammad", "Abdul", "Fatema", "Ayesha", "Rahim", "Karim",
+         "Nasrin", "Shirin", "Jahid", "Tahmina", "Sultana", "Rafiq", "Habib"]
+LAST = ["Rahman", "Hossain", "Islam", "Ahmed", "Khan", "Chowdhury", "Begum",
+        "Akter", "Uddin", "Sarkar", "Miah", "Talukder"]
+
+def make_csv(n):
+    rnd = random.Random(42)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["name", "age", "sex", "mobile", "address"])
+    for i in range(n):
+        age = rnd.randrange(90) if rnd.random() > 0.02 else "unknown"
+        writer.writerow([f"{rnd.choice(FIRST)} {rnd.choice(LAST)}", age,
+                         rnd.choice(["M", "F", "male", "Female"]),
+                         f"+880 1{rnd.randrange(10 ** 9):09d}",
+                         f"House {i}, Road {rnd.randrange(50)}, Dhaka"])
+    return buf.getvalue()
+
+def main(n, clinic_id, batch_size, pipeline_only):
+    data = make_csv(n)
+
+    errors = ErrorLog()
+    start = time.perf_counter()
+    valid = sum(len(b) for b in batched(validated(parse_csv(io.StringIO(data)), errors), batch_size))
+    elapsed = time.perf_counter() - start
+    print(f"pipeline: {n} rows in {elapsed:.2f}s, {n / elapsed:,.0f} rows/sec "
+          f"({valid} valid, {errors.count} rejected)")
+
+    if pipeline_only:
+        return
+    result = import_patients(io.StringIO(data), "csv", clinic_id, batch_size=batch_size)
+    print(f"import:   {result['imported']} imported, {result['rejected']} rejected "
+          f"in {result['elapsed_sec']}s, {result['rows_per_sec']:,} rows/sec")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--clinic-id", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--pipeline-only", action="store_true")
+    args = parser.parse_args()
+    main(args.rows, args.clinic_id, args.batch_size, args.pipeline_only)
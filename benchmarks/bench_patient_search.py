@@ -0,0 +1,88 @@
+"""p50/p95 latency of find_patients() against a large patients table.
+
+Run migrate_database.py first so the pg_trgm indexes exist. --seed inserts
+synthetic patients (codes prefixed BEN) into the configured database, so
+point POSTGRES_DSN at a scratch database.
+
+    python -m benchmarks.bench_patient_search --seed 1000000 --queries 500
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.db.context import get_db_cursor
+from app.db.async_pools import async_pool
+from app.db.pools import pool
+from app.services.patient_search import find_patients
+
+FIRST = ["Mohammad", "Muhammad", "Abdul", "Fatema", "Ayesha", "Rahim", "Karim",
+         "Nasrin", "Shirin", "Jahid", "Tahmina", "Sultana", "Rafiq", "Habib"]
+LAST = ["Rahman", "Hossain", "Islam", "Ahmed", "Khan", "Chowdhury", "Begum",
+        "Akter", "Uddin", "Sarkar", "Miah", "Talukder"]
+
+SEED_SQL = """
+    INSERT INTO patients (patient_id, full_name, age, gender, phone, created_at)
+    SELECT 'BEN' || lpad(g::text, 7, '0'),
+           (%(first)s::text[])[1 + floor(random() * cardinality(%(first)s::text[]))::int] || ' ' ||
+           (%(last)s::text[])[1 + floor(random() * cardinality(%(last)s::text[]))::int],
+           floor(random() * 90)::int,
+           CASE WHEN random() < 0.5 THEN 'Male' ELSE 'Female' END,
+           '+8801' || lpad(floor(random() * 1e9)::bigint::text, 9, '0'),
+           now() - random() * interval '5 years'
+    FROM generate_series(1, %(n)s) g
+    ON CONFLICT (patient_id) DO NOTHING
+"""
+
+def seed(n):
+    print(f"seeding {n} patients...")
+    with get_db_cursor() as cur:
+        cur.execute(SEED_SQL, {"first": FIRST, "last": LAST, "n": n})
+        cur.execute("ANALYZE patients")
+
+def typo(word):
+    i = random.randrange(len(word))
+    return word[:i] + random.choice("aeiouy") + word[i + 1:]
+
+def make_queries(n):
+    queries = []
+    for _ in range(n):
+        kind = random.random()
+        if kind < 0.6:
+            queries.append(typo(f"{random.choice(FIRST)} {random.choice(LAST)}"))
+        elif kind < 0.85:
+            queries.append("01" + "".join(random.choices("0123456789", k=5)))
+        else:
+            queries.append(f"BEN{random.randrange(10 ** 6):07d}"[:8])
+    return queries
+
+async def main(seed_rows, total):
+    if seed_rows:
+        seed(seed_rows)
+    await async_pool.open(wait=True)
+    try:
+        with get_db_cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM patients")
+            print(f"patients: {cur.fetchone()[0]:,}")
+
+        timings = []
+        for q in make_queries(total):
+            start = time.perf_counter()
+            await find_patients(q)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{total} queries: p50 {statistics.median(timings):.1f} ms, "
+              f"p95 {p95:.1f} ms, max {timings[-1]:.1f} ms")
+    finally:
+        await async_pool.close()
+        pool.closeall()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.seed, args.queries))
@@ -0,0 +1,73 @@
+"""Memory and lookup latency of the /patients/suggest prefix index.
+
+Builds PrefixIndex over synthetic patients in memory (no database needed
+beyond importing the app settings) and reports traced memory plus lookup
+timings for code, phone and name prefixes.
+
+    python -m benchmarks.bench_patient_suggest --patients 1000000
+"""
+import argparse
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+
+from app.services.patient_suggest import PrefixIndex
+
+FIRST = ["Mohammad", "Muhammad", "Abdul", "Fatema", "Ayesha", "Rahim", "Karim",
+         "Nasrin", "Shirin", "Jahid", "Tahmina", "Sultana", "Rafiq", "Habib"]
+LAST = ["Rahman", "Hossain", "Islam", "Ahmed", "Khan", "Chowdhury", "Begum",
+        "Akter", "Uddin", "Sarkar", "Miah", "Talukder"]
+
+def rows(n):
+    rnd = random.Random(42)
+    for pk in range(1, n + 1):
+        yield (pk, f"PAT{pk:07d}",
+               f"{rnd.choice(FIRST)} {rnd.choice(LAST)} {rnd.choice(LAST)}",
+               f"+8801{rnd.randrange(10 ** 9):09d}", pk % 8 + 1)
+
+def main(n, lookups):
+    index = PrefixIndex(country_code="880")
+    start = time.perf_counter()
+    index.build(rows(n))
+    build_s = time.perf_counter() - start
+
+    # Second, traced build for memory; tracing slows it down too much to time
+    index = PrefixIndex(country_code="880")
+    gc.collect()
+    tracemalloc.start()
+    index.build(rows(n))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{n:,} patients, {len(index._keys):,} keys, built in {build_s:.1f}s")
+    print(f"index memory {current / 2**20:.0f} MiB "
+          f"({current / n:.0f} B/patient), build peak {peak / 2**20:.0f} MiB")
+
+    rnd = random.Random(7)
+    queries = []
+    for _ in range(lookups):
+        kind = rnd.random()
+        if kind < 0.4:
+            queries.append(f"PAT{rnd.randrange(n):07d}"[:rnd.randint(5, 9)])
+        elif kind < 0.7:
+            queries.append("01" + "".join(rnd.choices("0123456789", k=rnd.randint(2, 6))))
+        else:
+            name = rnd.choice(FIRST).lower()
+            queries.append(name[:rnd.randint(2, len(name))])
+
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        index.lookup(q, limit=10)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    print(f"{lookups} lookups: p50 {statistics.median(timings):.0f} us, "
+          f"p99 {timings[int(len(timings) * 0.99) - 1]:.0f} us, max {timings[-1]:.0f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.patients, args.lookups)
@@ -0,0 +1,72 @@
+"""Requests/sec for the patients list query set, sync pool vs async pool.
+
+The sync variant is dispatched through anyio.to_thread.run_sync with the
+default 40-thread limiter, which is how FastAPI runs plain ``def`` handlers;
+the async variant runs on the event loop the way ``async def`` handlers do.
+
+    python -m benchmarks.bench_patients_async --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+
+import anyio
+
+from app.db.context import get_db_cursor
+from app.db.async_context import get_async_cursor
+from app.db.async_pools import async_pool
+from app.db.pools import pool
+
+QUERIES = [
+    "SELECT COUNT(*) FROM patients",
+    "SELECT COUNT(*) FROM patients WHERE DATE(created_at) = CURRENT_DATE",
+    "SELECT COUNT(DISTINCT patient_id) FROM visits WHERE DATE(visit_date) = CURRENT_DATE",
+    """
+    SELECT p.id, p.patient_id, p.full_name, p.age, p.gender, p.phone, p.address,
+           COALESCE(c.name, 'Unknown') as clinic_name, p.created_at
+    FROM patients p
+    LEFT JOIN clinics c ON p.clinic_id = c.id
+    ORDER BY p.created_at DESC
+    LIMIT 20
+    """,
+]
+
+def sync_request():
+    with get_db_cursor() as cur:
+        for query in QUERIES:
+            cur.execute(query)
+            cur.fetchall()
+
+async def async_request():
+    async with get_async_cursor() as cur:
+        for query in QUERIES:
+            await cur.execute(query)
+            await cur.fetchall()
+
+async def run(label, make_request, total, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            await make_request()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:>6}: {total} requests in {elapsed:.2f}s -> {total / elapsed:,.0f} req/s")
+
+async def main(total, concurrency):
+    await async_pool.open(wait=True)
+    try:
+        await run("sync", lambda: anyio.to_thread.run_sync(sync_request), total, concurrency)
+        await run("async", async_request, total, concurrency)
+    finally:
+        await async_pool.close()
+        pool.closeall()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
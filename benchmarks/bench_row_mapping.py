@@ -0,0 +1,86 @@
+"""Time and memory to materialise 10k patient rows, per row representation.
+
+Compares the old per-row dict comprehension against the named-tuple rows the
+pools now return (app/db/rows.py) and a __slots__ record class. Each variant
+starts from the raw column values the driver decodes, so "tuple + dict"
+includes the plain tuple the old cursors built before the dict copy.
+
+    python -m benchmarks.bench_row_mapping --rows 10000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime
+
+COLUMNS = ["id", "patient_id", "name", "age", "gender", "phone", "address",
+           "clinic_name", "created_at", "visit_count"]
+
+PatientRow = namedtuple("PatientRow", COLUMNS)
+
+class PatientRecord:
+    __slots__ = COLUMNS
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+def make_values(n):
+    now = datetime.now()
+    return [
+        [i, f"PAT{i:06d}", f"Patient {i}", 30 + i % 50, "Female", f"+880171{i:07d}",
+         "Dhaka", "Downtown Medical Center", now, 0]
+        for i in range(n)
+    ]
+
+def as_dicts(values):
+    rows = [tuple(v) for v in values]
+    return [
+        {
+            "id": r[0], "patient_id": r[1], "name": r[2], "age": r[3],
+            "gender": r[4], "phone": r[5], "address": r[6],
+            "clinic_name": r[7], "created_at": r[8], "visit_count": r[9],
+        }
+        for r in rows
+    ]
+
+def as_namedtuples(values):
+    make = PatientRow._make
+    return [make(v) for v in values]
+
+def as_slots(values):
+    return [PatientRecord(*v) for v in values]
+
+def measure(fn, values, repeat):
+    gc.collect()
+    tracemalloc.start()
+    result = fn(values)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(values)
+        best = min(best, time.perf_counter() - start)
+    return best, peak
+
+def main(n, repeat):
+    values = make_values(n)
+    print(f"{n} rows, best of {repeat}")
+    for label, fn in [("tuple + dict", as_dicts),
+                      ("namedtuple", as_namedtuples),
+                      ("__slots__", as_slots)]:
+        elapsed, peak = measure(fn, values, repeat)
+        print(f"{label:>13}: {elapsed * 1000:7.2f} ms  {peak / 1024:8.0f} KiB  "
+              f"({peak / n:.0f} B/row)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,82 @@
+"""Per-request session overhead: signed cookie vs server-side session ID.
+
+Drives Starlette's SessionMiddleware and ServerSessionMiddleware directly
+(no HTTP server) around an endpoint that reads ``request.session["user"]``,
+with a logged-in user carried in the request cookie. The server-side store
+is warmed so requests hit its in-process tier; no database is needed.
+Reports microseconds per request plus request cookie and Set-Cookie bytes.
+
+    python -m benchmarks.bench_sessions --requests 50000
+"""
+import argparse
+import asyncio
+import secrets
+import time
+
+from starlette.middleware.sessions import SessionMiddleware
+from app.services.sessions import ServerSessionMiddleware, SessionStore
+
+USER = {
+    "id": 42, "username": "dr.rahman", "full_name": "Dr. Abdur Rahman",
+    "email": "rahman@example.org", "phone": "+8801711000000", "role": "doctor",
+    "clinic_id": 3, "clinic_name": "Mirpur Clinic", "has_emoc": False,
+}
+
+async def endpoint(scope, receive, send):
+    assert scope["session"]["user"]["id"] == USER["id"]
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+async def login(scope, receive, send):
+    scope["session"]["user"] = USER
+    await endpoint(scope, receive, send)
+
+async def call(middleware, cookie=None):
+    headers = [(b"cookie", cookie)] if cookie else []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    return [v for k, v in sent[0]["headers"] if k == b"set-cookie"]
+
+async def measure(name, make, requests):
+    # Log in once to get the cookie, then replay it
+    set_cookie = await call(make(login))
+    cookie = set_cookie[0].split(b";")[0]
+    middleware = make(endpoint)
+    reply = await call(middleware, cookie)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(middleware, cookie)
+    per_request = (time.perf_counter() - start) / requests
+
+    reply_bytes = len(reply[0]) if reply else 0
+    print(f"{name:<12} {per_request * 1e6:7.1f} us/request, cookie {len(cookie)} bytes, "
+          f"Set-Cookie per response {reply_bytes} bytes")
+
+async def main(requests):
+    store = SessionStore()
+
+    async def create(data):
+        # Warm in-process tier only; the benchmark has no database
+        sid = secrets.token_urlsafe(32)
+        store._remember(sid, data, time.time() + store.timeout, time.time())
+        store.created += 1
+        return sid
+    store.create = create
+
+    await measure("cookie", lambda app: SessionMiddleware(app, secret_key="bench-secret"), requests)
+    await measure("server-side", lambda app: ServerSessionMiddleware(app, store), requests)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
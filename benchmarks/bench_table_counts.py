@@ -0,0 +1,78 @@
+"""Latency and error of exact COUNT(*) vs the planner-statistics estimate.
+
+Creates a scratch table bench_count_rows with --rows rows, ANALYZEs it,
+then inserts and deletes --churn of that many rows without re-analyzing so
+the estimate has to rely on the delta tracked since ANALYZE. Both modes
+are timed --repeat times.
+
+    python -m benchmarks.bench_table_counts --rows 10000000
+"""
+import argparse
+import statistics
+import time
+
+from app.db.context import get_db_cursor
+from app.services.table_counts import ESTIMATE_SQL
+
+TABLE = "bench_count_rows"
+
+def seed(n, churn):
+    print(f"seeding {n:,} rows...")
+    with get_db_cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"""
+            CREATE TABLE {TABLE} (
+                id BIGSERIAL PRIMARY KEY,
+                username VARCHAR(50),
+                created_at TIMESTAMP DEFAULT now(),
+                payload TEXT
+            )
+        """)
+        cur.execute(f"""
+            INSERT INTO {TABLE} (username, payload)
+            SELECT 'user' || (g % 5000), md5(g::text)
+            FROM generate_series(1, %s) g
+        """, (n,))
+    with get_db_cursor() as cur:
+        cur.execute(f"ANALYZE {TABLE}")
+    with get_db_cursor() as cur:
+        extra = int(n * churn)
+        cur.execute(f"""
+            INSERT INTO {TABLE} (username, payload)
+            SELECT 'late' || g, md5(g::text) FROM generate_series(1, %s) g
+        """, (extra,))
+        cur.execute(f"DELETE FROM {TABLE} WHERE id %% 100 = 0 AND id <= %s", (extra * 50,))
+    # Let the stats collector pick up the last transaction
+    time.sleep(2)
+
+def timed(sql, params, repeat):
+    timings, value = [], None
+    with get_db_cursor() as cur:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cur.execute(sql, params)
+            value = cur.fetchone()[0]
+            timings.append((time.perf_counter() - start) * 1000)
+    return value, timings
+
+def main(rows, churn, repeat, reuse):
+    if not reuse:
+        seed(rows, churn)
+
+    exact, exact_ms = timed(f"SELECT COUNT(*) FROM {TABLE}", (), repeat)
+    estimate, estimate_ms = timed(ESTIMATE_SQL, {"table": TABLE}, repeat)
+    error = abs(estimate - exact) / exact * 100 if exact else 0.0
+
+    print(f"exact:    {exact:,} rows, p50 {statistics.median(exact_ms):.1f} ms, "
+          f"max {max(exact_ms):.1f} ms")
+    print(f"estimate: {estimate:,} rows, p50 {statistics.median(estimate_ms):.2f} ms, "
+          f"max {max(estimate_ms):.2f} ms, error {error:.2f}%")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--churn", type=float, default=0.02, help="fraction inserted after ANALYZE")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--reuse", action="store_true", help="skip seeding, reuse the existing table")
+    args = parser.parse_args()
+    main(args.rows, args.churn, args.repeat, args.reuse)
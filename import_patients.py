@@ -0,0 +1,44 @@
+"""Bulk import patients from a CSV or NDJSON file.
+
+    python import_patients.py legacy_patients.csv --clinic-id 3
+    python import_patients.py export.ndjson --clinic-id 3 --errors errors.csv
+"""
+from app.services.patient_import import import_patients, detect_format, BATCH_SIZE
+import argparse
+import csv
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import patients")
+    parser.add_argument("path")
+    parser.add_argument("--clinic-id", type=int, required=True)
+    parser.add_argument("--created-by", type=int, default=None, help="user id recorded as creator")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--errors", help="write rejected rows (line, error) to this CSV")
+    args = parser.parse_args()
+
+    logger.info(f"🚀 Importing patients from {args.path}...")
+    with open(args.path, encoding="utf-8-sig", newline="") as stream:
+        result = import_patients(stream, args.format or detect_format(args.path),
+                                 args.clinic_id, args.created_by, args.batch_size)
+
+    logger.info(f"✅ Imported {result['imported']} patients "
+                f"({result['rows_per_sec']} rows/sec, {result['elapsed_sec']}s)")
+    if result["rejected"]:
+        logger.warning(f"⚠️ {result['rejected']} rows rejected, "
+                       f"{result['duplicates']} of them duplicates")
+        for error in result["errors"][:20]:
+            logger.warning(f"  line {error['line']}: {error['error']}")
+    if args.errors and result["errors"]:
+        with open(args.errors, "w", newline="") as out:
+            writer = csv.DictWriter(out, fieldnames=["line", "error"])
+            writer.writeheader()
+            writer.writerows(result["errors"])
+        logger.info(f"Rejected rows written to {args.errors}")
+
+if __name__ == "__main__":
+    main()
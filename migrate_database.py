@@ -1,6 +1,8 @@
 import psycopg2
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import os
+import sys
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -23,29 +25,41 @@ def get_db_connection():
         logger.error(f"Database connection failed: {e}")
         return None
 
+@contextmanager
+def migration_step(cursor, name, failed):
+    """Run one step under a savepoint, so a failure undoes only that step
+    and the rest of the migration can still run and commit"""
+    cursor.execute("SAVEPOINT migration_step")
+    try:
+        yield
+        cursor.execute("RELEASE SAVEPOINT migration_step")
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT migration_step")
+        logger.warning(f"{name}: {e}")
+        failed.append(name)
+
 def migrate_database():
     conn = get_db_connection()
     if not conn:
         logger.error("❌ Cannot connect to database")
         return False
 
+    failed = []
     try:
         cursor = conn.cursor()
 
         # Add missing columns to clinics table
         logger.info("Adding missing columns to clinics table...")
-        try:
+        with migration_step(cursor, "Clinics table migration", failed):
             cursor.execute("ALTER TABLE clinics ADD COLUMN IF NOT EXISTS address TEXT")
             cursor.execute("ALTER TABLE clinics ADD COLUMN IF NOT EXISTS phone VARCHAR(20)")
             cursor.execute("ALTER TABLE clinics ADD COLUMN IF NOT EXISTS email VARCHAR(255)")
             cursor.execute("ALTER TABLE clinics ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
             logger.info("✅ Clinics table updated")
-        except Exception as e:
-            logger.warning(f"Clinics table migration: {e}")
 
         # Add missing columns to users table
         logger.info("Adding missing columns to users table...")
-        try:
+        with migration_step(cursor, "Users table migration", failed):
             cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS email VARCHAR(255)")
             cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS phone VARCHAR(20)")
             cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS last_login_at TIMESTAMP")
@@ -57,12 +71,10 @@ def migrate_database():
             cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS last_login_lon DECIMAL(10, 6)")
             cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS last_login_isp VARCHAR(255)")
             logger.info("✅ Users table updated")
-        except Exception as e:
-            logger.warning(f"Users table migration: {e}")
 
         # Create login_logs table
         logger.info("Creating login_logs table...")
-        try:
+        with migration_step(cursor, "Login logs table creation", failed):
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS login_logs (
                     id SERIAL PRIMARY KEY,
@@ -80,10 +92,444 @@ def migrate_database():
                 )
             """)
             logger.info("✅ Login logs table created")
-        except Exception as e:
-            logger.warning(f"Login logs table creation: {e}")
+
+        # Monthly range partitions for login_logs; archive_login_logs.py keeps
+        # partitions created ahead and archives old ones
+        logger.info("Partitioning login_logs...")
+        with migration_step(cursor, "Login logs partitioning", failed):
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION ensure_login_log_partitions(
+                    first_month DATE DEFAULT now()::date, months_ahead INTEGER DEFAULT 3)
+                RETURNS INTEGER AS $$
+                DECLARE
+                    m DATE := date_trunc('month', first_month)::date;
+                    last_month DATE := (date_trunc('month', now()) + make_interval(months => months_ahead))::date;
+                    part TEXT;
+                    created INTEGER := 0;
+                BEGIN
+                    WHILE m <= last_month LOOP
+                        part := 'login_logs_' || to_char(m, 'YYYY_MM');
+                        IF to_regclass(part) IS NULL THEN
+                            EXECUTE format('CREATE TABLE %I PARTITION OF login_logs FOR VALUES FROM (%L) TO (%L)',
+                                           part, m, (m + interval '1 month')::date);
+                            created := created + 1;
+                        END IF;
+                        m := (m + interval '1 month')::date;
+                    END LOOP;
+                    RETURN created;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'login_logs'::regclass")
+            if cursor.fetchone()[0] == "r":
+                # One-time conversion: copy the plain table into a partitioned one
+                cursor.execute("ALTER TABLE login_logs RENAME TO login_logs_unpartitioned")
+                cursor.execute("""
+                    CREATE TABLE login_logs (
+                        id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+                        username VARCHAR(50) NOT NULL,
+                        login_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                        ip_address VARCHAR(50),
+                        country VARCHAR(100),
+                        region VARCHAR(100),
+                        city VARCHAR(100),
+                        latitude DECIMAL(10, 6),
+                        longitude DECIMAL(10, 6),
+                        isp VARCHAR(255),
+                        success BOOLEAN NOT NULL,
+                        user_agent TEXT,
+                        PRIMARY KEY (id, login_time)
+                    ) PARTITION BY RANGE (login_time)
+                """)
+                # Created on every partition, present and future
+                cursor.execute("CREATE INDEX idx_login_logs_time_id ON login_logs (login_time DESC, id DESC)")
+
+                cursor.execute("SELECT COALESCE(MIN(login_time), now()) FROM login_logs_unpartitioned")
+                oldest = cursor.fetchone()[0]
+                cursor.execute("SELECT ensure_login_log_partitions(%s::date)", (oldest,))
+                cursor.execute("""
+                    INSERT INTO login_logs (id, username, login_time, ip_address, country, region, city,
+                                            latitude, longitude, isp, success, user_agent)
+                    SELECT id, username, COALESCE(login_time, %s), ip_address, country, region, city,
+                           latitude, longitude, isp, success, user_agent
+                    FROM login_logs_unpartitioned
+                """, (oldest,))
+                logger.info(f"Copied {cursor.rowcount} login log rows into monthly partitions")
+                cursor.execute("""
+                    SELECT setval(pg_get_serial_sequence('login_logs', 'id'), COALESCE(MAX(id), 0) + 1, false)
+                    FROM login_logs
+                """)
+                cursor.execute("DROP TABLE login_logs_unpartitioned")
+            else:
+                cursor.execute("SELECT ensure_login_log_partitions()")
+            logger.info("✅ Login logs partitioned by month")
+
+        # Login-log explorer filters (app/services/login_log_search.py): each index
+        # ends in the page order so a filtered page is a single range scan
+        logger.info("Creating login log explorer indexes...")
+        with migration_step(cursor, "Login log explorer indexes", failed):
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_login_logs_time_id
+                ON login_logs (login_time DESC, id DESC)
+            """)
+            cursor.execute("DROP INDEX IF EXISTS idx_login_logs_time")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_login_logs_username
+                ON login_logs (username, login_time DESC, id DESC)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_login_logs_ip
+                ON login_logs (ip_address varchar_pattern_ops, login_time DESC, id DESC)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_login_logs_country
+                ON login_logs (country, login_time DESC, id DESC)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_login_logs_failed
+                ON login_logs (login_time DESC, id DESC) WHERE NOT success
+            """)
+            logger.info("✅ Login log explorer indexes created")
+
+        # Keyset pagination index for the patient list and search pages
+        logger.info("Creating patients pagination index...")
+        with migration_step(cursor, "Patients pagination index", failed):
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_patients_created_at_id
+                ON patients (created_at DESC, id DESC)
+            """)
+            logger.info("✅ Patients pagination index created")
+
+        # Trigram indexes behind /patients/search (app/services/patient_search.py)
+        logger.info("Creating patient search indexes...")
+        with migration_step(cursor, "Patient search indexes", failed):
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_patients_full_name_trgm
+                ON patients USING gin (full_name gin_trgm_ops)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_patients_patient_id_trgm
+                ON patients USING gin (patient_id gin_trgm_ops)
+            """)
+            cursor.execute(r"""
+                CREATE INDEX IF NOT EXISTS idx_patients_phone_digits_trgm
+                ON patients USING gin ((regexp_replace(phone, '\D', '', 'g')) gin_trgm_ops)
+            """)
+            logger.info("✅ Patient search indexes created")
+
+        # Sequence behind app/services/patient_codes.py, started past any
+        # codes already issued by the old COUNT(*)-based scheme
+        logger.info("Creating patient code sequence...")
+        with migration_step(cursor, "Patient code sequence", failed):
+            cursor.execute("CREATE SEQUENCE IF NOT EXISTS patient_code_seq")
+            cursor.execute(r"""
+                SELECT setval('patient_code_seq', GREATEST(
+                    (SELECT COALESCE(MAX(substring(patient_id FROM '\d+$')::bigint), 0)
+                     FROM patients WHERE patient_id ~ '^PAT\d+$'),
+                    (SELECT last_value FROM patient_code_seq),
+                    1))
+            """)
+            # Per-clinic sequences (PATIENT_CODE_PER_CLINIC) for the existing clinics
+            cursor.execute("""
+                DO $$
+                DECLARE c INTEGER;
+                BEGIN
+                    FOR c IN SELECT id FROM clinics LOOP
+                        EXECUTE format('CREATE SEQUENCE IF NOT EXISTS %I', 'patient_code_seq_c' || c);
+                    END LOOP;
+                END
+                $$
+            """)
+            logger.info("✅ Patient code sequence ready")
+
+        # Visit history on the patient chart pages by (visit_date, id)
+        logger.info("Creating visit history index...")
+        with migration_step(cursor, "Visit history index", failed):
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_visits_patient_date
+                ON visits (patient_id, visit_date DESC, id DESC)
+            """)
+            logger.info("✅ Visit history index created")
+
+        # Duplicate check in the bulk importer (same clinic and phone)
+        logger.info("Creating patient import index...")
+        with migration_step(cursor, "Patient import index", failed):
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_patients_clinic_phone
+                ON patients (clinic_id, phone)
+            """)
+            logger.info("✅ Patient import index created")
+
+        # Per-clinic, per-day counters behind the dashboards (app/services/counters.py).
+        # Row triggers keep them current; reconcile_daily_counts() rebuilds them
+        # from the source tables.
+        logger.info("Creating daily counters...")
+        with migration_step(cursor, "Daily counters", failed):
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS daily_counts (
+                    clinic_id INTEGER NOT NULL DEFAULT 0,
+                    day DATE NOT NULL,
+                    patients_registered INTEGER NOT NULL DEFAULT 0,
+                    visits INTEGER NOT NULL DEFAULT 0,
+                    visiting_patients INTEGER NOT NULL DEFAULT 0,
+                    revenue_paid NUMERIC(14, 2) NOT NULL DEFAULT 0,
+                    revenue_pending NUMERIC(14, 2) NOT NULL DEFAULT 0,
+                    login_attempts INTEGER NOT NULL DEFAULT 0,
+                    login_failures INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (clinic_id, day)
+                )
+            """)
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION bump_daily_counts(
+                    c INTEGER, d DATE,
+                    n_registered INTEGER DEFAULT 0, n_visits INTEGER DEFAULT 0,
+                    n_visiting INTEGER DEFAULT 0, n_paid NUMERIC DEFAULT 0,
+                    n_pending NUMERIC DEFAULT 0, n_attempts INTEGER DEFAULT 0,
+                    n_failures INTEGER DEFAULT 0
+                ) RETURNS void AS $$
+                    INSERT INTO daily_counts AS dc (clinic_id, day, patients_registered, visits,
+                        visiting_patients, revenue_paid, revenue_pending, login_attempts, login_failures)
+                    VALUES (COALESCE(c, 0), d, n_registered, n_visits, n_visiting,
+                            n_paid, n_pending, n_attempts, n_failures)
+                    ON CONFLICT (clinic_id, day) DO UPDATE SET
+                        patients_registered = dc.patients_registered + EXCLUDED.patients_registered,
+                        visits = dc.visits + EXCLUDED.visits,
+                        visiting_patients = dc.visiting_patients + EXCLUDED.visiting_patients,
+                        revenue_paid = dc.revenue_paid + EXCLUDED.revenue_paid,
+                        revenue_pending = dc.revenue_pending + EXCLUDED.revenue_pending,
+                        login_attempts = dc.login_attempts + EXCLUDED.login_attempts,
+                        login_failures = dc.login_failures + EXCLUDED.login_failures
+                $$ LANGUAGE sql
+            """)
+
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION patients_daily_counts() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.created_at IS NOT NULL THEN
+                        PERFORM bump_daily_counts(OLD.clinic_id, OLD.created_at::date, n_registered => -1);
+                    END IF;
+                    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.created_at IS NOT NULL THEN
+                        PERFORM bump_daily_counts(NEW.clinic_id, NEW.created_at::date, n_registered => 1);
+                    END IF;
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+            cursor.execute("DROP TRIGGER IF EXISTS patients_daily_counts ON patients")
+            cursor.execute("""
+                CREATE TRIGGER patients_daily_counts
+                AFTER INSERT OR DELETE OR UPDATE OF clinic_id, created_at ON patients
+                FOR EACH ROW EXECUTE FUNCTION patients_daily_counts()
+            """)
+
+            # A visit adds a visiting patient only if it is that patient's first
+            # visit to the clinic that day (served by idx_visits_patient_date)
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION visits_daily_counts() RETURNS trigger AS $$
+                DECLARE
+                    first_visit BOOLEAN;
+                BEGIN
+                    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.visit_date IS NOT NULL THEN
+                        first_visit := NOT EXISTS (
+                            SELECT 1 FROM visits
+                            WHERE patient_id = OLD.patient_id AND id <> OLD.id
+                              AND clinic_id IS NOT DISTINCT FROM OLD.clinic_id
+                              AND visit_date >= OLD.visit_date::date
+                              AND visit_date < OLD.visit_date::date + 1);
+                        PERFORM bump_daily_counts(OLD.clinic_id, OLD.visit_date::date,
+                            n_visits => -1, n_visiting => CASE WHEN first_visit THEN -1 ELSE 0 END);
+                    END IF;
+                    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.visit_date IS NOT NULL THEN
+                        first_visit := NOT EXISTS (
+                            SELECT 1 FROM visits
+                            WHERE patient_id = NEW.patient_id AND id <> NEW.id
+                              AND clinic_id IS NOT DISTINCT FROM NEW.clinic_id
+                              AND visit_date >= NEW.visit_date::date
+                              AND visit_date < NEW.visit_date::date + 1);
+                        PERFORM bump_daily_counts(NEW.clinic_id, NEW.visit_date::date,
+                            n_visits => 1, n_visiting => CASE WHEN first_visit THEN 1 ELSE 0 END);
+                    END IF;
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+            cursor.execute("DROP TRIGGER IF EXISTS visits_daily_counts ON visits")
+            cursor.execute("""
+                CREATE TRIGGER visits_daily_counts
+                AFTER INSERT OR DELETE OR UPDATE OF patient_id, clinic_id, visit_date ON visits
+                FOR EACH ROW EXECUTE FUNCTION visits_daily_counts()
+            """)
+
+            # Login attempts count against the user's clinic (0 for unknown users)
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION login_logs_daily_counts() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM bump_daily_counts(
+                        (SELECT clinic_id FROM users WHERE username = NEW.username),
+                        COALESCE(NEW.login_time, now())::date,
+                        n_attempts => 1, n_failures => CASE WHEN NEW.success THEN 0 ELSE 1 END);
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+            cursor.execute("DROP TRIGGER IF EXISTS login_logs_daily_counts ON login_logs")
+            cursor.execute("""
+                CREATE TRIGGER login_logs_daily_counts
+                AFTER INSERT ON login_logs
+                FOR EACH ROW EXECUTE FUNCTION login_logs_daily_counts()
+            """)
+
+            # Revenue is booked on the bill's creation day, to the patient's clinic
+            cursor.execute("SELECT to_regclass('bills') IS NOT NULL")
+            has_bills = cursor.fetchone()[0]
+            if has_bills:
+                cursor.execute("""
+                    CREATE OR REPLACE FUNCTION bills_daily_counts() RETURNS trigger AS $$
+                    BEGIN
+                        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.created_at IS NOT NULL THEN
+                            PERFORM bump_daily_counts(
+                                (SELECT clinic_id FROM patients WHERE id = OLD.patient_id),
+                                OLD.created_at::date,
+                                n_paid => CASE WHEN OLD.status = 'paid' THEN -OLD.amount ELSE 0 END,
+                                n_pending => CASE WHEN OLD.status = 'pending' THEN -OLD.amount ELSE 0 END);
+                        END IF;
+                        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.created_at IS NOT NULL THEN
+                            PERFORM bump_daily_counts(
+                                (SELECT clinic_id FROM patients WHERE id = NEW.patient_id),
+                                NEW.created_at::date,
+                                n_paid => CASE WHEN NEW.status = 'paid' THEN NEW.amount ELSE 0 END,
+                                n_pending => CASE WHEN NEW.status = 'pending' THEN NEW.amount ELSE 0 END);
+                        END IF;
+                        RETURN NULL;
+                    END
+                    $$ LANGUAGE plpgsql
+                """)
+                cursor.execute("DROP TRIGGER IF EXISTS bills_daily_counts ON bills")
+                cursor.execute("""
+                    CREATE TRIGGER bills_daily_counts
+                    AFTER INSERT OR DELETE OR UPDATE OF patient_id, amount, status, created_at ON bills
+                    FOR EACH ROW EXECUTE FUNCTION bills_daily_counts()
+                """)
+
+            # The lock makes concurrent trigger updates wait for the rebuild and
+            # then apply on top of it, so no increment is lost or counted twice
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION reconcile_daily_counts(since DATE DEFAULT NULL)
+                RETURNS INTEGER AS $$
+                DECLARE
+                    n INTEGER;
+                BEGIN
+                    LOCK TABLE daily_counts IN EXCLUSIVE MODE;
+                    DELETE FROM daily_counts WHERE since IS NULL OR day >= since;
+
+                    INSERT INTO daily_counts (clinic_id, day, patients_registered, visits,
+                                              visiting_patients, login_attempts, login_failures)
+                    SELECT clinic_id, day, SUM(registered), SUM(n_visits), SUM(visiting),
+                           SUM(attempts), SUM(failures)
+                    FROM (
+                        SELECT COALESCE(clinic_id, 0) AS clinic_id, created_at::date AS day,
+                               COUNT(*) AS registered, 0 AS n_visits, 0 AS visiting,
+                               0 AS attempts, 0 AS failures
+                        FROM patients
+                        WHERE created_at >= COALESCE(since, '-infinity')
+                        GROUP BY 1, 2
+                        UNION ALL
+                        SELECT COALESCE(clinic_id, 0), visit_date::date,
+                               0, COUNT(*), COUNT(DISTINCT patient_id), 0, 0
+                        FROM visits
+                        WHERE visit_date >= COALESCE(since, '-infinity')
+                        GROUP BY 1, 2
+                        UNION ALL
+                        SELECT COALESCE(u.clinic_id, 0), l.login_time::date,
+                               0, 0, 0, COUNT(*), COUNT(*) FILTER (WHERE NOT l.success)
+                        FROM login_logs l
+                        LEFT JOIN users u ON u.username = l.username
+                        WHERE l.login_time >= COALESCE(since, '-infinity')
+                        GROUP BY 1, 2
+                    ) s
+                    GROUP BY clinic_id, day;
+
+                    IF to_regclass('bills') IS NOT NULL THEN
+                        EXECUTE $q$
+                            INSERT INTO daily_counts AS dc (clinic_id, day, revenue_paid, revenue_pending)
+                            SELECT COALESCE(p.clinic_id, 0), b.created_at::date,
+                                   COALESCE(SUM(b.amount) FILTER (WHERE b.status = 'paid'), 0),
+                                   COALESCE(SUM(b.amount) FILTER (WHERE b.status = 'pending'), 0)
+                            FROM bills b
+                            LEFT JOIN patients p ON p.id = b.patient_id
+                            WHERE b.created_at >= COALESCE($1, '-infinity')
+                            GROUP BY 1, 2
+                            ON CONFLICT (clinic_id, day) DO UPDATE SET
+                                revenue_paid = EXCLUDED.revenue_paid,
+                                revenue_pending = EXCLUDED.revenue_pending
+                        $q$ USING since;
+                    END IF;
+
+                    SELECT COUNT(*) INTO n FROM daily_counts WHERE since IS NULL OR day >= since;
+                    RETURN n;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+
+            # Backfill once, when the table is first created
+            cursor.execute("SELECT NOT EXISTS (SELECT 1 FROM daily_counts)")
+            if cursor.fetchone()[0]:
+                cursor.execute("SELECT reconcile_daily_counts()")
+            logger.info("✅ Daily counters ready")
+
+        # Server-side sessions; the cookie holds only the id
+        with migration_step(cursor, "Sessions table", failed):
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id VARCHAR(64) PRIMARY KEY,
+                    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+                    data JSONB NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    last_seen_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    expires_at TIMESTAMPTZ NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+            logger.info("✅ Sessions table ready")
+
+        # Tell every app worker to drop its cached copy of a changed user
+        with migration_step(cursor, "User change notifications", failed):
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION users_notify_change() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('user_changed', OLD.id::text);
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            """)
+            cursor.execute("DROP TRIGGER IF EXISTS users_notify_change ON users")
+            cursor.execute("""
+                CREATE TRIGGER users_notify_change
+                AFTER UPDATE OF username, full_name, email, phone, role, clinic_id, is_active, password
+                OR DELETE ON users
+                FOR EACH ROW EXECUTE FUNCTION users_notify_change()
+            """)
+            logger.info("✅ User change notifications ready")
+
+        # Shared login rate-limit buckets (LOGIN_RATE_BACKEND=postgres). Unlogged:
+        # losing them on a crash only resets the limits.
+        with migration_step(cursor, "Login rate limit table", failed):
+            cursor.execute("""
+                CREATE UNLOGGED TABLE IF NOT EXISTS login_rate_limits (
+                    key VARCHAR(200) PRIMARY KEY,
+                    tokens DOUBLE PRECISION NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
+            logger.info("✅ Login rate limit table ready")
 
         conn.commit()
+        if failed:
+            logger.error(f"❌ Migration steps failed (the others were applied): {', '.join(failed)}")
+            return False
         logger.info("✅ Database migration completed successfully!")
         return True
 
@@ -169,8 +615,10 @@ def main():
             logger.info("🎉 Migration completed successfully!")
         else:
             logger.warning("⚠️ Migration completed but sample data update failed")
+            sys.exit(1)
     else:
         logger.error("❌ Migration failed")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
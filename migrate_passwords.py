@@ -0,0 +1,54 @@
+"""Convert plaintext passwords in users.password to scrypt hashes.
+
+Safe to re-run: rows already hashed are skipped, and a row is only updated
+if its password hasn't changed since it was read. Hashing is spread over
+the password worker pool.
+
+    python migrate_passwords.py --batch-size 200
+"""
+from app.db.context import get_db_cursor
+from app.services.passwords import hash_password, hash_pool, PREFIX
+from psycopg2.extras import execute_values
+import argparse
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_passwords(batch_size):
+    migrated, last_id = 0, 0
+    started = time.perf_counter()
+    while True:
+        with get_db_cursor() as cur:
+            cur.execute("""
+                SELECT id, password FROM users
+                WHERE id > %s AND password NOT LIKE %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, PREFIX + "$%", batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            hashes = list(hash_pool.map(hash_password, [row.password for row in rows]))
+            execute_values(cur, """
+                UPDATE users u SET password = v.new
+                FROM (VALUES %s) AS v (id, old, new)
+                WHERE u.id = v.id AND u.password = v.old
+            """, [(row.id, row.password, new) for row, new in zip(rows, hashes)])
+            migrated += cur.rowcount
+            last_id = rows[-1].id
+        logger.info(f"  {migrated} passwords hashed so far...")
+    return migrated, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Hash plaintext user passwords")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    logger.info("🚀 Migrating plaintext passwords...")
+    migrated, elapsed = migrate_passwords(args.batch_size)
+    logger.info(f"✅ {migrated} passwords hashed in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Rebuild the dashboard counters (daily_counts) from the source tables.
+
+Meant for a nightly cron entry; --days limits the rebuild to recent days.
+Login counts can only be rebuilt for months still in login_logs, so once
+archive_login_logs.py has archived a month, use --days to keep its counts.
+
+    python reconcile_counters.py            # everything
+    python reconcile_counters.py --days 7   # the last week
+"""
+from app.services.counters import reconcile_counters
+from datetime import date, timedelta
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile dashboard counters")
+    parser.add_argument("--days", type=int, help="only rebuild this many recent days")
+    args = parser.parse_args()
+
+    since = date.today() - timedelta(days=args.days - 1) if args.days else None
+    logger.info("🚀 Reconciling daily counters...")
+    rows = reconcile_counters(since)
+    logger.info(f"✅ {rows} clinic-days rebuilt")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import psycopg2
 from dotenv import load_dotenv
+from app.services.passwords import hash_password
 import os
 import logging
 
@@ -152,12 +153,12 @@ def seed_data():
             ("manager2", "manager123", "David Miller", "david.miller@imageehr.com", "+1-555-1008", "manager", 2)
         ]
 
-        for user in users_data:
+        for username, password, *rest in users_data:
             cursor.execute("""
                 INSERT INTO users (username, password, full_name, email, phone, role, clinic_id)
                 VALUES (%s, %s, %s, %s, %s, %s, %s)
                 ON CONFLICT (username) DO NOTHING
-            """, user)
+            """, (username, hash_password(password), *rest))
 
         # Insert sample patients
         patients_data = [
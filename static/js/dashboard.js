@@ -15,6 +15,9 @@ document.addEventListener("DOMContentLoaded", function () {
 
     // Load dashboard data
     loadDashboardData();
+
+    // Keep the overview stats current without reloading
+    setupLiveUpdates();
 });
 
 function initializeDashboard() {
@@ -384,6 +387,69 @@ function loadClinicsData() {
     }
 }
 
+function setupLiveUpdates() {
+    if (typeof EhrEvents === "undefined") {
+        return;
+    }
+
+    EhrEvents.on("patient_registered", function (data) {
+        bumpStat("total-patients", 1);
+        addActivity(`New patient registered: #${data.id}`);
+    });
+    EhrEvents.on("patients_imported", function (data) {
+        bumpStat("total-patients", data.count);
+        addActivity(`${data.count} patients imported`);
+    });
+    EhrEvents.on("visit_recorded", function (data) {
+        if (data.today) {
+            bumpStat("today-appointments", 1);
+        }
+        addActivity(`Visit recorded: patient #${data.patient_id}`);
+    });
+    // Other clinics' changes: the headline cards cover every clinic
+    EhrEvents.on("counts", function (data) {
+        bumpStat("total-patients", data.patients || 0);
+        bumpStat("today-appointments", data.today_visits || 0);
+    });
+}
+
+function bumpStat(id, delta) {
+    const el = document.getElementById(id);
+    if (!el || el.dataset.value === undefined) {
+        return;
+    }
+    const value = Number(el.dataset.value) + delta;
+    const prefix = el.textContent.trim().startsWith("~") ? "~" : "";
+    el.dataset.value = value;
+    el.textContent = prefix + value;
+}
+
+function addActivity(desc) {
+    const activityList = document.getElementById("activity-list");
+    if (!activityList) {
+        return;
+    }
+    const item = document.createElement("div");
+    item.className = "activity-item";
+
+    const time = document.createElement("span");
+    time.className = "activity-time";
+    time.textContent = new Date().toLocaleTimeString([], {
+        hour: "2-digit",
+        minute: "2-digit",
+    });
+
+    const text = document.createElement("span");
+    text.className = "activity-desc";
+    text.textContent = desc;
+
+    item.append(time, text);
+    activityList.prepend(item);
+    while (activityList.children.length > 10) {
+        activityList.lastElementChild.remove();
+    }
+}
+
 // Additional utility functions
 function refreshData() {
     console.log("Refreshing dashboard data...");
@@ -0,0 +1,55 @@
+// Small client for the dashboard event stream (/dashboard/events).
+//
+//     EhrEvents.on("patient_registered", (data) => { ... });
+//
+// One EventSource is shared by every handler on the page; the browser
+// reconnects on its own and resumes from the last event id it saw.
+const EhrEvents = (function () {
+    const url = "/dashboard/events";
+    const handlers = {};
+    let source = null;
+
+    function connect() {
+        if (source || !window.EventSource) {
+            return;
+        }
+        source = new EventSource(url);
+        source.onerror = function () {
+            console.log("Event stream interrupted, reconnecting...");
+        };
+        Object.keys(handlers).forEach(listen);
+    }
+
+    function listen(type) {
+        source.addEventListener(type, function (e) {
+            let data;
+            try {
+                data = JSON.parse(e.data);
+            } catch (err) {
+                console.error("Bad event payload:", e.data);
+                return;
+            }
+            handlers[type].forEach((handler) => handler(data));
+        });
+    }
+
+    function on(type, handler) {
+        if (!handlers[type]) {
+            handlers[type] = [];
+            if (source) {
+                listen(type);
+            }
+        }
+        handlers[type].push(handler);
+        connect();
+    }
+
+    function close() {
+        if (source) {
+            source.close();
+            source = null;
+        }
+    }
+
+    return { on: on, close: close };
+})();